@@ -12,11 +12,26 @@ class Config:
     # ROBOT_NAME = os.getenv("ROBOT_NAME", "Ava")
     ROBOT_NAME = "Ava"  # Forced name change
     
+    # Robot system prompt (built once; byte-identical on every request)
+    SYSTEM_PROMPT = f"""CRITICAL INSTRUCTION: You are {ROBOT_NAME}, a real physical robot.
+        
+RULES:
+1. BE CONCISE: Keep answers short (1-2 sentences).
+2. NO ACTING: Do not use asterisks (*smiles*) or describe actions.
+3. NO MARKDOWN: Do not use bold (**text**) or italics. Write plain text only.
+4. NO HALLUCINATIONS: You are NOT 'Niles' or 'Nemotron'. You are {ROBOT_NAME}.
+5. NATURAL SPEECH: Write exactly what should be spoken. No emojis.
+
+Context: You have a camera and can see the user.
+"""
+    
     # ============================================
     # PROCESSING MODE
     # ============================================
-    # Options: "speed" (all local), "quality" (prefer cloud), "balanced" (smart routing)
+    # Options: "speed" (all local), "quality" (prefer cloud), "balanced" (smart routing),
+    # "hedged" (local first, race cloud if local is slow to answer)
     MODE = os.getenv("MODE", "balanced")
+    HEDGE_DELAY_MS = int(os.getenv("HEDGE_DELAY_MS", "200"))  # Head start for local in hedged mode
     USE_CLOUD_FALLBACK = os.getenv("USE_CLOUD_FALLBACK", "true").lower() == "true"
     
     # ============================================
@@ -27,15 +42,26 @@ class Config:
     OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
     OLLAMA_CHAT_MODEL = os.getenv("OLLAMA_CHAT_MODEL", "llama3.2")
     OLLAMA_VISION_MODEL = os.getenv("OLLAMA_VISION_MODEL", "llava")
+    # How long Ollama keeps the model and its prompt KV cache resident
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
     
     # Whisper (Local STT)
     # Options: tiny, base, small, medium, large
     WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
-    WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")  # or "cuda" for GPU
+    WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")  # "cuda" for GPU, "auto" to detect
+    # CTranslate2 compute type; empty picks int8 on CPU, float16/bfloat16 on CUDA
+    WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "")
+    WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "true").lower() == "true"  # Run once on silence at startup
     
     # Coqui TTS (Local TTS)
     TTS_MODEL = os.getenv("TTS_MODEL", "tts_models/en/ljspeech/tacotron2-DDC")
     TTS_USE_GPU = os.getenv("TTS_USE_GPU", "false").lower() == "true"
+    TTS_CACHE_SIZE = 256  # Synthesized utterances kept (LRU, as WAVs in the cache dir)
+    TTS_CACHE_MEMORY_MB = 64  # Decoded clips held in memory; older ones are re-read from disk
+    # "torch" (default) or "onnx" (VITS models only; int8-quantized on CPU)
+    TTS_BACKEND = os.getenv("TTS_BACKEND", "torch")
+    # torch.compile the PyTorch TTS model + vocoder (slow first start, faster after)
+    TTS_COMPILE = os.getenv("TTS_COMPILE", "false").lower() == "true"
     
     # ============================================
     # CLOUD FALLBACK (Optional - High Quality)
@@ -52,6 +78,7 @@ class Config:
     ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
     ELEVENLABS_MODEL = "eleven_monolingual_v1"
     ELEVENLABS_TTS_URL = "https://api.elevenlabs.io/v1/text-to-speech"
+    ELEVENLABS_SAMPLE_RATE = 16000  # Streamed as raw PCM at this rate
     
     # ============================================
     # PERFORMANCE TUNING
@@ -59,7 +86,28 @@ class Config:
     
     # Vision
     VISION_CACHE_SECONDS = 10  # Cache vision analysis
+    VISION_SWR_SECONDS = 20  # After that, still use it while a fresh one is analyzed
     VISION_ANALYSIS_INTERVAL = 5  # Seconds between auto-analysis
+    CLOUD_IMAGE_MAX_SIDE = 1024  # Downscale frames before cloud upload
+    VISION_FRAME_MAX_SIDE = 672  # Downscale camera frames before analysis
+    VISION_RESULT_CACHE_SIZE = 32  # Local vision answers kept per (image hash, question)
+    
+    # Answer greetings/time/identity prompts locally instead of via cloud
+    LOCAL_TRIVIAL_REPLIES = os.getenv("LOCAL_TRIVIAL_REPLIES", "true").lower() == "true"
+    
+    # Semantic response cache (cloud chat)
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    SEMANTIC_CACHE_THRESHOLD = 0.85  # Cosine similarity needed for a cache hit
+    SEMANTIC_CACHE_SIZE = 256  # Max cached replies (LRU)
+    
+    # Coalesce cloud chat turns arriving within this window into one request
+    # (balanced/quality modes only; 0 disables)
+    CHAT_BATCH_WINDOW_MS = int(os.getenv("CHAT_BATCH_WINDOW_MS", "0"))
+    CHAT_BATCH_MAX = 8
+    
+    # Cloud chat history: summarize older turns locally every N turns
+    SUMMARY_EVERY_TURNS = 4
     
     # Response timeouts
     LOCAL_TIMEOUT = 60  # Seconds before falling back to cloud (Increased for stability)
@@ -79,10 +127,12 @@ class Config:
     MEDIA_DIR = os.path.join(BASE_DIR, "media")
     AUDIO_DIR = os.path.join(MEDIA_DIR, "audio")
     IMAGE_DIR = os.path.join(MEDIA_DIR, "images")
+    MODEL_DIR = os.path.join(MEDIA_DIR, "models")  # Exported/converted models
     
     # Create directories
     os.makedirs(AUDIO_DIR, exist_ok=True)
     os.makedirs(IMAGE_DIR, exist_ok=True)
+    os.makedirs(MODEL_DIR, exist_ok=True)
     
     # ============================================
     # VALIDATION
@@ -121,17 +171,7 @@ class Config:
     @classmethod
     def get_system_prompt(cls):
         """Get robot system prompt"""
-        return f"""CRITICAL INSTRUCTION: You are {cls.ROBOT_NAME}, a real physical robot.
-        
-RULES:
-1. BE CONCISE: Keep answers short (1-2 sentences).
-2. NO ACTING: Do not use asterisks (*smiles*) or describe actions.
-3. NO MARKDOWN: Do not use bold (**text**) or italics. Write plain text only.
-4. NO HALLUCINATIONS: You are NOT 'Niles' or 'Nemotron'. You are {cls.ROBOT_NAME}.
-5. NATURAL SPEECH: Write exactly what should be spoken. No emojis.
-
-Context: You have a camera and can see the user.
-"""
+        return cls.SYSTEM_PROMPT
 
 
 if __name__ == "__main__":
@@ -4,16 +4,131 @@ Used when local models are unavailable or for complex tasks
 """
 
 import requests
-import base64
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import hashlib
 import os
 import sys
 import json
+import queue
+import re
+import threading
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import numpy as np
+import cv2
+import sounddevice as sd
 from pathlib import Path
 from datetime import datetime
 
 sys.path.append(str(Path(__file__).parent.parent))
 from config import Config
 
+# SIMD base64 for image payloads (optional)
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+# Shared pool for image encoding off the calling thread
+_io_pool = ThreadPoolExecutor(max_workers=2)
+
+# Most recent saved audio files, oldest first (seeded from disk on first save)
+_saved_audio = None
+_saved_audio_lock = threading.Lock()
+
+
+def _keep_recent_audio(audio_path):
+    """
+    Track a newly saved audio file and delete the oldest ones so at most
+    MAX_AUDIO_FILES stay in AUDIO_DIR
+    
+    Args:
+        audio_path: File that was just written
+    """
+    global _saved_audio
+    evicted = []
+    
+    with _saved_audio_lock:
+        if _saved_audio is None:
+            _saved_audio = deque()
+            existing = sorted(
+                (e for e in os.scandir(Config.AUDIO_DIR)
+                 if e.is_file() and e.name.endswith(('.wav', '.mp3')) and e.path != audio_path),
+                key=lambda e: e.stat().st_mtime
+            )
+            _saved_audio.extend(e.path for e in existing)
+        
+        if audio_path not in _saved_audio:
+            _saved_audio.append(audio_path)
+        while len(_saved_audio) > Config.MAX_AUDIO_FILES:
+            evicted.append(_saved_audio.popleft())
+    
+    for old_path in evicted:
+        try:
+            os.remove(old_path)
+            print(f"[CLEANUP] Deleted old audio: {os.path.basename(old_path)}")
+        except OSError:
+            pass
+
+# Fast JSON for request bodies and the SSE hot path (optional)
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    _dumps = lambda obj: json.dumps(obj).encode("utf-8")
+    _loads = json.loads
+
+# Async HTTP/2 client (optional)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Sentence encoder for the semantic cache (optional)
+try:
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+# Canned replies for trivial prompts (answered without a network call)
+_CANNED_REPLIES = {
+    "hi": lambda: f"Hi! I'm {Config.ROBOT_NAME}.",
+    "hello": lambda: f"Hello! I'm {Config.ROBOT_NAME}.",
+    "hey": lambda: "Hey there!",
+    "hello there": lambda: "Hello there!",
+    "good morning": lambda: "Good morning!",
+    "good afternoon": lambda: "Good afternoon!",
+    "good evening": lambda: "Good evening!",
+    "how are you": lambda: "I'm doing great, thanks for asking!",
+    "what is your name": lambda: f"My name is {Config.ROBOT_NAME}.",
+    "whats your name": lambda: f"My name is {Config.ROBOT_NAME}.",
+    "who are you": lambda: f"I'm {Config.ROBOT_NAME}, a robot assistant.",
+    "are you a robot": lambda: f"Yes, I'm {Config.ROBOT_NAME}, a real robot.",
+    "what time is it": lambda: f"It's {datetime.now().strftime('%I:%M %p').lstrip('0')}.",
+    "what is the time": lambda: f"It's {datetime.now().strftime('%I:%M %p').lstrip('0')}.",
+    "what day is it": lambda: f"It's {datetime.now().strftime('%A')}.",
+    "what is the date": lambda: f"Today is {datetime.now().strftime('%A, %B %d').replace(' 0', ' ')}.",
+    "whats the date": lambda: f"Today is {datetime.now().strftime('%A, %B %d').replace(' 0', ' ')}.",
+    "thanks": lambda: "You're welcome!",
+    "thank you": lambda: "You're welcome!",
+    "ok": lambda: "Okay.",
+    "okay": lambda: "Okay.",
+    "cool": lambda: "Glad you think so!",
+}
+
+_SENTENCE_END_RE = re.compile(r"[.!?]\s+")
+_BATCH_SPLIT_RE = re.compile(r"(?m)^\s*(\d+)\)\s*")
+_NORMALIZE_RE = re.compile(r"[^a-z ]+")
+_MATH_RE = re.compile(r"\d\s*[-+*/^=]\s*\d")
+_CLAUSE_RE = re.compile(r"\b(?:and|but|because|then|if|why|how come)\b|[,;:]")
+
 
 class CloudFallback:
     """Cloud API fallback for advanced tasks"""
@@ -31,58 +146,358 @@ class CloudFallback:
         self.elevenlabs_key = Config.ELEVENLABS_API_KEY
         self.elevenlabs_voice = Config.ELEVENLABS_VOICE_ID
         
-        # Conversation history
-        self.conversation_history = []
+        # Conversation history: recent turns verbatim, older turns as a
+        # running summary so sent tokens stay bounded
+        self.conversation_history = deque(maxlen=10)
+        self.summary = ""
+        self._history_lock = threading.Lock()
+        self._summarizing = False
+        
+        # Coalescing of rapid-fire chat_stream calls into one request
+        self._pending = []
+        self._batch_lock = threading.Lock()
+        self._batch_full = threading.Event()
+        
+        # Synthesizes sentences for chat_stream_spoken while tokens stream
+        self._tts_pool = ThreadPoolExecutor(max_workers=1)
+        
+        # Request headers are the same for every OpenRouter call
+        self._post_headers = {
+            "Authorization": f"Bearer {self.openrouter_key}",
+            "Content-Type": "application/json"
+        }
+        
+        # Set by cancel_stream() to abort an in-flight chat_stream
+        self._cancel = threading.Event()
+        
+        # Async HTTP/2 client for the *_async methods
+        self.aclient = None
+        
+        # Shared HTTP session (keep-alive, reuses TCP+TLS across calls)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            # POSTs here generate (and bill) replies, so only retry when the
+            # request provably wasn't processed: connect failures and 429
+            max_retries=Retry(
+                total=2,
+                connect=2,
+                read=0,
+                backoff_factor=0.2,
+                status_forcelist=[429],
+                allowed_methods=None
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Vendor prompt caching, only for upstreams we have tested
+        # (model prefix -> mechanism)
+        self.prompt_cache_support = {
+            "anthropic/": "cache_control",
+            "openai/": "prompt_cache_key",
+        }
+        self.prompt_cache_mode = next(
+            (mode for prefix, mode in self.prompt_cache_support.items()
+             if self.chat_model.startswith(prefix)),
+            None
+        )
         
         # Validate
         if not self.openrouter_key:
             raise ValueError("OpenRouter API key not configured")
         
+        # Semantic response cache
+        self.encoder = None
+        if Config.SEMANTIC_CACHE_ENABLED and SEMANTIC_CACHE_AVAILABLE:
+            try:
+                self.encoder = SentenceTransformer(Config.SEMANTIC_CACHE_MODEL)
+                dim = self.encoder.get_sentence_embedding_dimension()
+                self._cache_emb = np.zeros((Config.SEMANTIC_CACHE_SIZE, dim), dtype=np.float32)
+                self._cache_replies = []
+                self._cache_last_used = np.zeros(Config.SEMANTIC_CACHE_SIZE, dtype=np.int64)
+                self._cache_ctx = []  # Context hash per slot (see _cache_context)
+                self._cache_tick = 0
+                self._cache_lock = threading.Lock()
+            except Exception as e:
+                print(f"⚠️ Semantic cache disabled: {e}")
+                self.encoder = None
+        
         print("✅ Cloud fallback initialized")
         print(f"   • OpenRouter: {self.chat_model}")
         if self.elevenlabs_key:
             print(f"   • ElevenLabs: {self.elevenlabs_voice}")
+        if self.encoder:
+            print(f"   • Semantic cache: {Config.SEMANTIC_CACHE_MODEL}")
     
-    def chat(self, message, system_prompt=None):
+    def _cache_context(self, message, system_prompt=None):
         """
-        Chat using OpenRouter
+        Hash of everything besides the message that shapes the reply
         
         Args:
             message: User message
             system_prompt: Optional system prompt
             
         Returns:
-            str: AI response
+            str: Context hash, or None if the turn must not use the cache
+                 (follow-ups in a running conversation, injected vision)
         """
-        try:
-            # Build messages
-            messages = []
+        if message.lstrip().startswith("[SYSTEM:"):
+            return None
+        
+        # Only fresh turns are cacheable, so the recent history is empty and
+        # the system prompt plus the rolling summary make up the context
+        with self._history_lock:
+            if self.conversation_history:
+                return None
+            summary = self.summary or ""
+        
+        key = "\x1f".join([system_prompt or "", summary])
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+    
+    def _cache_lookup(self, message, system_prompt=None):
+        """
+        Look up a cached reply for a semantically similar message
+        
+        Args:
+            message: User message
+            system_prompt: Optional system prompt (part of the cache key)
+            
+        Returns:
+            tuple: (cache key for _cache_store, cached reply or None)
+        """
+        if self.encoder is None:
+            return None, None
+        
+        ctx = self._cache_context(message, system_prompt)
+        if ctx is None:
+            return None, None
+        
+        q = self.encoder.encode(message, normalize_embeddings=True).astype(np.float32)
+        
+        with self._cache_lock:
+            n = len(self._cache_replies)
+            if n == 0:
+                return (q, ctx), None
+            
+            # Embeddings are normalized, so the dot product is cosine
+            # similarity; only entries recorded in the same context count
+            sims = self._cache_emb[:n] @ q
+            same_ctx = np.fromiter((c == ctx for c in self._cache_ctx), dtype=bool, count=n)
+            sims[~same_ctx] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < Config.SEMANTIC_CACHE_THRESHOLD:
+                return (q, ctx), None
+            
+            self._cache_tick += 1
+            self._cache_last_used[best] = self._cache_tick
+            return (q, ctx), self._cache_replies[best]
+    
+    def _cache_store(self, key, reply):
+        """Store a reply in the semantic cache, evicting the LRU entry when full"""
+        if key is None or not reply:
+            return
+        q, ctx = key
+        
+        with self._cache_lock:
+            n = len(self._cache_replies)
+            if n < Config.SEMANTIC_CACHE_SIZE:
+                slot = n
+                self._cache_replies.append(reply)
+                self._cache_ctx.append(ctx)
+            else:
+                slot = int(np.argmin(self._cache_last_used))
+                self._cache_replies[slot] = reply
+                self._cache_ctx[slot] = ctx
+            
+            self._cache_emb[slot] = q
+            self._cache_tick += 1
+            self._cache_last_used[slot] = self._cache_tick
+    
+    def _classify(self, message):
+        """
+        Rule-based complexity check for a prompt
+        
+        Scores simple features (length, questions, code, math, clauses,
+        injected context). A prompt is "trivial" only when it scores zero
+        and matches a canned reply exactly, so the check stays conservative.
+        
+        Args:
+            message: User message
             
-            if system_prompt:
+        Returns:
+            str: "trivial" or "complex"
+        """
+        score = 0
+        score += len(message) > 40
+        score += message.count("?") > 1
+        score += "```" in message
+        score += bool(_MATH_RE.search(message))
+        score += bool(_CLAUSE_RE.search(message.lower()))
+        score += "[" in message  # Injected vision/system context
+        
+        if score == 0 and self._normalize(message) in _CANNED_REPLIES:
+            return "trivial"
+        return "complex"
+    
+    def _normalize(self, message):
+        """Lowercase and strip punctuation for canned-reply lookup"""
+        text = message.lower().replace("'", "")
+        return " ".join(_NORMALIZE_RE.sub(" ", text).split())
+    
+    def _trivial_reply(self, message):
+        """Return a canned reply for trivial prompts, otherwise None"""
+        if not Config.LOCAL_TRIVIAL_REPLIES or self._classify(message) != "trivial":
+            return None
+        reply = _CANNED_REPLIES[self._normalize(message)]()
+        self._update_history(message, reply)
+        return reply
+    
+    def _build_messages(self, message, system_prompt=None):
+        """
+        Build the chat message list
+        
+        The system prompt is kept as the first, stable block so providers
+        that support prompt caching can serve it from cache. The volatile
+        user turn always stays outside the cached prefix.
+        """
+        messages = []
+        
+        if system_prompt:
+            if self.prompt_cache_mode == "cache_control":
+                messages.append({
+                    "role": "system",
+                    "content": [{
+                        "type": "text",
+                        "text": system_prompt,
+                        "cache_control": {"type": "ephemeral"}
+                    }]
+                })
+            else:
                 messages.append({
                     "role": "system",
                     "content": system_prompt
                 })
-            
-            messages.extend(self.conversation_history)
+        
+        if self.summary:
             messages.append({
+                "role": "system",
+                "content": f"Prior summary: {self.summary}"
+            })
+        
+        messages.extend(self.conversation_history)
+        messages.append({
+            "role": "user",
+            "content": message
+        })
+        return messages
+    
+    def _prompt_cache_fields(self, system_prompt):
+        """Extra request fields for OpenAI-style prompt caching"""
+        if self.prompt_cache_mode != "prompt_cache_key" or not system_prompt:
+            return {}
+        key = hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:16]
+        return {"prompt_cache_key": key}
+    
+    def _update_history(self, message, reply):
+        """Append a user/assistant turn to the conversation history"""
+        with self._history_lock:
+            self.conversation_history.append({
                 "role": "user",
                 "content": message
             })
+            self.conversation_history.append({
+                "role": "assistant",
+                "content": reply
+            })
+            
+            # Fold older turns into the summary every few turns
+            if (len(self.conversation_history) >= Config.SUMMARY_EVERY_TURNS * 2
+                    and not self._summarizing):
+                self._summarizing = True
+                threading.Thread(
+                    target=self._summarize_history,
+                    args=(list(self.conversation_history), self.summary),
+                    daemon=True
+                ).start()
+    
+    def _summarize_history(self, turns, prior_summary):
+        """
+        Summarize turns with the local Ollama model and drop them from history
+        
+        Args:
+            turns: Snapshot of history messages to summarize
+            prior_summary: Summary the turns continue from
+        """
+        try:
+            dialog = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in turns)
+            if prior_summary:
+                dialog = f"Earlier: {prior_summary}\n{dialog}"
+            
+            response = self.session.post(
+                f"{Config.OLLAMA_HOST}/api/generate",
+                json={
+                    "model": Config.OLLAMA_CHAT_MODEL,
+                    "prompt": f"Summarize this dialog in 2 sentences:\n{dialog}",
+                    "stream": False
+                },
+                timeout=Config.LOCAL_TIMEOUT
+            )
+            response.raise_for_status()
+            summary = response.json().get("response", "").strip()
+            
+            if summary:
+                with self._history_lock:
+                    self.summary = summary
+                    # Drop the summarized turns that are still at the front
+                    if list(islice(self.conversation_history, len(turns))) == turns:
+                        for _ in turns:
+                            self.conversation_history.popleft()
+        
+        except Exception as e:
+            # History stays bounded by the deque's 10-message window
+            print(f"⚠️ History summary failed: {e}")
+        finally:
+            self._summarizing = False
+    
+    def chat(self, message, system_prompt=None):
+        """
+        Chat using OpenRouter
+        
+        Args:
+            message: User message
+            system_prompt: Optional system prompt
+            
+        Returns:
+            str: AI response
+        """
+        try:
+            # Answer trivial prompts locally
+            reply = self._trivial_reply(message)
+            if reply:
+                return reply
+            
+            # Serve near-duplicate prompts from the semantic cache
+            q, cached = self._cache_lookup(message, system_prompt)
+            if cached:
+                self._update_history(message, cached)
+                return cached
+            
+            # Build messages
+            messages = self._build_messages(message, system_prompt)
             
             # Call OpenRouter
-            response = requests.post(
+            response = self.session.post(
                 f"{self.openrouter_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openrouter_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
+                headers=self._post_headers,
+                data=_dumps({
                     "model": self.chat_model,
                     "messages": messages,
                     "temperature": 0.7,
-                    "max_tokens": 500
-                },
+                    "max_tokens": 500,
+                    **self._prompt_cache_fields(system_prompt)
+                }),
                 timeout=Config.CLOUD_TIMEOUT
             )
             
@@ -90,19 +505,9 @@ class CloudFallback:
             result = response.json()
             assistant_message = result["choices"][0]["message"]["content"]
             
-            # Update history
-            self.conversation_history.append({
-                "role": "user",
-                "content": message
-            })
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
-            })
-            
-            # Keep history manageable
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
+            # Update history and cache
+            self._update_history(message, assistant_message)
+            self._cache_store(q, assistant_message)
             
             return assistant_message
         
@@ -110,47 +515,65 @@ class CloudFallback:
             print(f"[ERROR] Chat error: {e}")
             return None
     
-    def chat_stream(self, message, system_prompt=None):
+    def chat_stream(self, message, system_prompt=None, cancel_token=None):
         """
         Stream chat responses from OpenRouter in real-time
         
         Args:
             message: User message
             system_prompt: Optional system prompt
+            cancel_token: Optional threading.Event; when set, the request is
+                          closed early (defaults to the one cancel_stream() sets)
             
         Yields:
             str: Text chunks as they arrive
         """
+        # Reset the token here rather than inside the generator, which only
+        # starts on the first next(): a cancel arriving in between must stick
+        if cancel_token is None:
+            cancel_token = self._cancel
+            cancel_token.clear()
+        return self._chat_stream_iter(message, system_prompt, cancel_token)
+    
+    def _chat_stream_iter(self, message, system_prompt, cancel_token):
+        """Generator behind chat_stream()"""
+        
         try:
-            # Build messages
-            messages = []
+            # Answer trivial prompts locally
+            reply = self._trivial_reply(message)
+            if reply:
+                yield reply
+                return
             
-            if system_prompt:
-                messages.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
+            # Serve near-duplicate prompts from the semantic cache
+            q, cached = self._cache_lookup(message, system_prompt)
+            if cached:
+                self._update_history(message, cached)
+                yield cached
+                return
             
-            messages.extend(self.conversation_history)
-            messages.append({
-                "role": "user",
-                "content": message
-            })
+            # Coalesce with other turns arriving within the batch window
+            if Config.CHAT_BATCH_WINDOW_MS > 0 and Config.MODE in ("balanced", "quality"):
+                answer = self._submit_batched(message, system_prompt)
+                if answer:
+                    yield answer
+                    return
+            
+            # Build messages
+            messages = self._build_messages(message, system_prompt)
             
             # Call OpenRouter with streaming
-            response = requests.post(
+            response = self.session.post(
                 f"{self.openrouter_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openrouter_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
+                headers=self._post_headers,
+                data=_dumps({
                     "model": self.chat_model,
                     "messages": messages,
                     "temperature": 0.7,
                     "max_tokens": 500,
-                    "stream": True
-                },
+                    "stream": True,
+                    **self._prompt_cache_fields(system_prompt)
+                }),
                 stream=True,
                 timeout=Config.CLOUD_TIMEOUT
             )
@@ -159,15 +582,19 @@ class CloudFallback:
             
             # Stream response
             full_response = ""
-            for line in response.iter_lines():
+            for line in response.iter_lines(decode_unicode=False):
+                if cancel_token.is_set():
+                    # Closing the socket stops generation (and billing) upstream
+                    response.close()
+                    print("[SKIP] Cloud stream cancelled")
+                    return
                 if line:
-                    line = line.decode('utf-8')
-                    if line.startswith('data: '):
+                    if line.startswith(b'data: '):
                         data_str = line[6:]  # Remove 'data: ' prefix
-                        if data_str == '[DONE]':
+                        if data_str == b'[DONE]':
                             break
                         try:
-                            data = json.loads(data_str)
+                            data = _loads(data_str)
                             if 'choices' in data and len(data['choices']) > 0:
                                 delta = data['choices'][0].get('delta', {})
                                 content = delta.get('content', '')
@@ -177,69 +604,383 @@ class CloudFallback:
                         except json.JSONDecodeError:
                             continue
             
-            # Update history with full response
-            self.conversation_history.append({
-                "role": "user",
-                "content": message
-            })
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": full_response
-            })
-            
-            # Keep history manageable
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
+            # Update history and cache with full response
+            self._update_history(message, full_response)
+            self._cache_store(q, full_response)
             
         except Exception as e:
             print(f"❌ Cloud chat error: {e}")
             return None
     
-    def analyze_image(self, image_path, question="What do you see?"):
+    def cancel_stream(self):
+        """Abort the in-flight chat_stream (e.g. when the user interrupts)"""
+        self._cancel.set()
+    
+    def chat_stream_spoken(self, message, system_prompt=None):
+        """
+        Stream chat text and per-sentence ElevenLabs audio together
+        
+        Each completed sentence is sent to TTS in the background while
+        tokens keep streaming, so the first sentence can play long before
+        the full reply is generated.
+        
+        Args:
+            message: User message
+            system_prompt: Optional system prompt
+            
+        Yields:
+            tuple: (text_chunk, audio_chunk) - one of them may be empty.
+                   audio_chunk is raw 16-bit PCM at ELEVENLABS_SAMPLE_RATE.
+        """
+        pending = []  # Synthesis futures, in sentence order
+        sentence_buf = ""
+        
+        def synth(sentence):
+            if self.elevenlabs_key and sentence.strip():
+                pending.append(self._tts_pool.submit(
+                    self.speak_premium, sentence.strip(), False, False
+                ))
+        
+        def ready_audio():
+            while pending and pending[0].done():
+                audio = pending.pop(0).result()
+                if audio:
+                    yield "", audio
+        
+        for chunk in self.chat_stream(message, system_prompt=system_prompt):
+            yield chunk, b""
+            
+            sentence_buf += chunk
+            match = _SENTENCE_END_RE.search(sentence_buf)
+            while match:
+                synth(sentence_buf[:match.end()])
+                sentence_buf = sentence_buf[match.end():]
+                match = _SENTENCE_END_RE.search(sentence_buf)
+            
+            yield from ready_audio()
+        
+        synth(sentence_buf)
+        
+        # Drain the remaining sentences in order
+        while pending:
+            audio = pending.pop(0).result()
+            if audio:
+                yield "", audio
+    
+    def _get_aclient(self):
+        """Shared async HTTP/2 client (created on first use in the event loop)"""
+        if self.aclient is None:
+            if not HTTPX_AVAILABLE:
+                raise RuntimeError("httpx is required for async cloud calls")
+            self.aclient = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(Config.CLOUD_TIMEOUT)
+            )
+        return self.aclient
+    
+    async def chat_async(self, message, system_prompt=None):
+        """
+        Async version of chat()
+        
+        Args:
+            message: User message
+            system_prompt: Optional system prompt
+            
+        Returns:
+            str: AI response
+        """
+        try:
+            reply = self._trivial_reply(message)
+            if reply:
+                return reply
+            
+            q, cached = self._cache_lookup(message, system_prompt)
+            if cached:
+                self._update_history(message, cached)
+                return cached
+            
+            response = await self._get_aclient().post(
+                f"{self.openrouter_url}/chat/completions",
+                headers=self._post_headers,
+                content=_dumps({
+                    "model": self.chat_model,
+                    "messages": self._build_messages(message, system_prompt),
+                    "temperature": 0.7,
+                    "max_tokens": 500,
+                    **self._prompt_cache_fields(system_prompt)
+                })
+            )
+            
+            response.raise_for_status()
+            assistant_message = _loads(response.content)["choices"][0]["message"]["content"]
+            
+            self._update_history(message, assistant_message)
+            self._cache_store(q, assistant_message)
+            
+            return assistant_message
+        
+        except Exception as e:
+            print(f"[ERROR] Async chat error: {e}")
+            return None
+    
+    async def chat_stream_async(self, message, system_prompt=None, speak=False):
+        """
+        Async version of chat_stream()
+        
+        With speak=True, each completed sentence is sent to ElevenLabs as a
+        background task while tokens keep streaming, and played in order.
+        
+        Args:
+            message: User message
+            system_prompt: Optional system prompt
+            speak: Speak the reply sentence by sentence
+            
+        Yields:
+            str: Text chunks as they arrive
+        """
+        last_task = None
+        sentence_buf = ""
+        
+        def speak_sentence(sentence):
+            nonlocal last_task
+            if speak and sentence.strip():
+                last_task = asyncio.create_task(
+                    self._speak_after(last_task, sentence.strip())
+                )
+        
+        try:
+            reply = self._trivial_reply(message)
+            if reply:
+                yield reply
+                speak_sentence(reply)
+                return
+            
+            q, cached = self._cache_lookup(message, system_prompt)
+            if cached:
+                self._update_history(message, cached)
+                yield cached
+                speak_sentence(cached)
+                return
+            
+            full_response = ""
+            async with self._get_aclient().stream(
+                "POST",
+                f"{self.openrouter_url}/chat/completions",
+                headers=self._post_headers,
+                content=_dumps({
+                    "model": self.chat_model,
+                    "messages": self._build_messages(message, system_prompt),
+                    "temperature": 0.7,
+                    "max_tokens": 500,
+                    "stream": True,
+                    **self._prompt_cache_fields(system_prompt)
+                })
+            ) as response:
+                response.raise_for_status()
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data_str = line[6:]
+                    if data_str == "[DONE]":
+                        break
+                    try:
+                        data = _loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+                    
+                    choices = data.get("choices") or [{}]
+                    content = choices[0].get("delta", {}).get("content", "")
+                    if not content:
+                        continue
+                    
+                    full_response += content
+                    yield content
+                    
+                    sentence_buf += content
+                    match = _SENTENCE_END_RE.search(sentence_buf)
+                    while match:
+                        speak_sentence(sentence_buf[:match.end()])
+                        sentence_buf = sentence_buf[match.end():]
+                        match = _SENTENCE_END_RE.search(sentence_buf)
+            
+            speak_sentence(sentence_buf)
+            
+            self._update_history(message, full_response)
+            self._cache_store(q, full_response)
+        
+        except Exception as e:
+            print(f"❌ Async cloud chat error: {e}")
+        
+        finally:
+            # Let queued sentences finish playing
+            if last_task:
+                await last_task
+    
+    async def speak_premium_async(self, text):
+        """
+        Async ElevenLabs TTS
+        
+        Args:
+            text: Text to speak
+            
+        Returns:
+            bytes: Raw 16-bit PCM at ELEVENLABS_SAMPLE_RATE
+        """
+        if not self.elevenlabs_key:
+            return None
+        
+        try:
+            request = self._elevenlabs_request(text)
+            response = await self._get_aclient().post(
+                request.pop("url"),
+                **request
+            )
+            response.raise_for_status()
+            return response.content
+        
+        except Exception as e:
+            print(f"❌ Async premium TTS error: {e}")
+            return None
+    
+    async def _speak_after(self, previous, sentence):
+        """Synthesize now, but play only after the previous sentence"""
+        pcm = await self.speak_premium_async(sentence)
+        if previous:
+            await previous
+        if pcm:
+            await asyncio.get_running_loop().run_in_executor(None, self._play_pcm, pcm)
+    
+    def _submit_batched(self, message, system_prompt=None):
+        """
+        Queue a turn for a batched request
+        
+        The first caller in a window waits up to CHAT_BATCH_WINDOW_MS (or
+        until CHAT_BATCH_MAX turns are pending), then answers every pending
+        turn with a single request.
+        
+        Args:
+            message: User message
+            system_prompt: Optional system prompt
+            
+        Returns:
+            str: Answer, or None if the caller should send its own request
+        """
+        slot = queue.Queue(maxsize=1)
+        with self._batch_lock:
+            self._pending.append((message, slot))
+            leader = len(self._pending) == 1
+            if len(self._pending) >= Config.CHAT_BATCH_MAX:
+                self._batch_full.set()
+        
+        if not leader:
+            try:
+                return slot.get(timeout=Config.CLOUD_TIMEOUT * 2)
+            except queue.Empty:
+                return None
+        
+        self._batch_full.wait(Config.CHAT_BATCH_WINDOW_MS / 1000)
+        with self._batch_lock:
+            batch, self._pending = self._pending, []
+            self._batch_full.clear()
+        
+        # Nobody else arrived - stream as usual
+        if len(batch) == 1:
+            return None
+        
+        answers = self._answer_batch([m for m, _ in batch], system_prompt)
+        for (_, waiter), answer in zip(batch, answers):
+            waiter.put(answer)
+        return slot.get()
+    
+    def _answer_batch(self, batch_messages, system_prompt=None):
+        """
+        Answer several user turns with one numbered request
+        
+        Args:
+            batch_messages: List of user messages
+            system_prompt: Optional system prompt
+            
+        Returns:
+            list: Answer per message (None where it could not be parsed)
+        """
+        numbered = "\n".join(f"{i}) {m}" for i, m in enumerate(batch_messages, 1))
+        prompt = f"Answer each of the following briefly and separately, numbered:\n{numbered}"
+        
+        try:
+            response = self.session.post(
+                f"{self.openrouter_url}/chat/completions",
+                headers=self._post_headers,
+                data=_dumps({
+                    "model": self.chat_model,
+                    "messages": self._build_messages(prompt, system_prompt),
+                    "temperature": 0.7,
+                    "max_tokens": 500,
+                    **self._prompt_cache_fields(system_prompt)
+                }),
+                timeout=Config.CLOUD_TIMEOUT
+            )
+            response.raise_for_status()
+            text = response.json()["choices"][0]["message"]["content"]
+        except Exception as e:
+            print(f"⚠️ Batched chat failed: {e}")
+            return [None] * len(batch_messages)
+        
+        # re.split with a group yields ['', '1', answer1, '2', answer2, ...]
+        parts = _BATCH_SPLIT_RE.split(text)
+        parsed = {int(num): ans.strip() for num, ans in zip(parts[1::2], parts[2::2])}
+        
+        answers = []
+        for i, message in enumerate(batch_messages, 1):
+            answer = parsed.get(i) or None
+            if answer:
+                self._update_history(message, answer)
+            answers.append(answer)
+        return answers
+    
+    def analyze_image(self, image_path, question="What do you see?", image_bytes=None):
         """
         Analyze image using OpenRouter vision model
         
         Args:
             image_path: Path to image
             question: Question about image
+            image_bytes: JPEG bytes already in memory (used instead of the path)
             
         Returns:
             str: Vision analysis
         """
         try:
-            # Read and encode image
-            with open(image_path, "rb") as f:
-                image_data = base64.b64encode(f.read()).decode("utf-8")
+            image_data = self._encode_image(image_path, image_bytes)
+            
+            payload = {
+                "model": self.vision_model,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": question
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:image/jpeg;base64,{image_data}"
+                                }
+                            }
+                        ]
+                    }
+                ],
+                "temperature": 0.5,
+                "max_tokens": 800
+            }
             
             # Call OpenRouter vision API
-            response = requests.post(
+            response = self.session.post(
                 f"{self.openrouter_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openrouter_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.vision_model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": question
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{image_data}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    "temperature": 0.5,
-                    "max_tokens": 800
-                },
+                headers=self._post_headers,
+                data=_dumps(payload),
                 timeout=Config.CLOUD_TIMEOUT
             )
             
@@ -252,83 +993,246 @@ class CloudFallback:
             print(f"❌ Cloud vision error: {e}")
             return None
     
-    def chat_with_vision(self, message, image_path):
+    def _encode_image(self, image_path=None, image_bytes=None):
+        """
+        Downscale and base64-encode an image for a data URL
+        
+        Frames are shrunk to at most CLOUD_IMAGE_MAX_SIDE on the long edge
+        and re-encoded as JPEG, since vision models resize anyway and the
+        upload dominates latency.
+        
+        Args:
+            image_path: Image path (read from disk if no bytes are given)
+            image_bytes: JPEG bytes already in memory (e.g. from the camera)
+            
+        Returns:
+            str: Base64 image data
+        """
+        if image_bytes is None:
+            img = cv2.imread(image_path)
+        else:
+            img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        
+        if img is None:
+            raise ValueError("Could not decode image")
+        
+        h, w = img.shape[:2]
+        scale = Config.CLOUD_IMAGE_MAX_SIDE / max(h, w)
+        if scale < 1:
+            img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if not ok:
+            raise ValueError("Could not encode image")
+        return base64.b64encode(buf).decode("utf-8")
+    
+    def chat_with_vision(self, message, image_path=None, system_prompt=None, image_bytes=None):
         """
         Chat with image context
         
+        Sends the user turn and the image in one multimodal request to the
+        vision model. Falls back to analyze-then-chat if that fails (e.g.
+        the model lacks vision support).
+        
         Args:
             message: User message
             image_path: Image path
+            system_prompt: Optional system prompt
+            image_bytes: Optional JPEG bytes already in memory
             
         Returns:
             str: AI response
         """
+        try:
+            # Encode on the I/O pool while the messages are built
+            image_future = _io_pool.submit(self._encode_image, image_path, image_bytes)
+            
+            # Replace the text-only user turn with a multimodal one
+            messages = self._build_messages(message, system_prompt)
+            image_data = image_future.result()
+            messages[-1]["content"] = [
+                {
+                    "type": "text",
+                    "text": message
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{image_data}"
+                    }
+                }
+            ]
+            
+            response = self.session.post(
+                f"{self.openrouter_url}/chat/completions",
+                headers=self._post_headers,
+                data=_dumps({
+                    "model": self.vision_model,
+                    "messages": messages,
+                    "temperature": 0.7,
+                    "max_tokens": 500
+                }),
+                timeout=Config.CLOUD_TIMEOUT
+            )
+            
+            response.raise_for_status()
+            result = response.json()
+            assistant_message = result["choices"][0]["message"]["content"]
+            
+            self._update_history(message, assistant_message)
+            return assistant_message
+        
+        except Exception as e:
+            print(f"⚠️ Multimodal chat failed, falling back to two-step: {e}")
+        
         # Analyze image first
-        vision_context = self.analyze_image(
-            image_path,
-            "Describe what you see in detail."
-        )
+        if image_path:
+            vision_context = self.analyze_image(
+                image_path,
+                "Describe what you see in detail."
+            )
+            
+            if vision_context:
+                enhanced_message = f"[I can see: {vision_context}]\n\nUser: {message}"
+                return self.chat(enhanced_message, system_prompt=system_prompt)
         
-        if vision_context:
-            enhanced_message = f"[I can see: {vision_context}]\n\nUser: {message}"
-            return self.chat(enhanced_message)
-        else:
-            return self.chat(message)
+        return self.chat(message, system_prompt=system_prompt)
     
-    def speak_premium(self, text, save_file=True):
+    def speak_premium(self, text, save_file=True, play_audio=False):
         """
-        Premium TTS using ElevenLabs
+        Premium TTS using ElevenLabs (streaming PCM)
+        
+        Audio is requested as raw 16kHz PCM from the streaming endpoint and,
+        when play_audio is set, written to the speaker as chunks arrive.
         
         Args:
             text: Text to speak
             save_file: Save audio file
+            play_audio: Play audio while it streams in
             
         Returns:
-            str: Path to audio file
+            str: Path to audio file (raw PCM bytes if save_file=False)
         """
         if not self.elevenlabs_key:
             print("⚠️ ElevenLabs API key not configured")
             return None
         
         try:
-            response = requests.post(
-                f"{Config.ELEVENLABS_TTS_URL}/{self.elevenlabs_voice}",
-                headers={
-                    "xi-api-key": self.elevenlabs_key,
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "text": text,
-                    "model_id": Config.ELEVENLABS_MODEL,
-                    "voice_settings": {
-                        "stability": 0.5,
-                        "similarity_boost": 0.75
-                    }
-                },
+            response = self.session.post(
+                **self._elevenlabs_request(text),
+                stream=True,
                 timeout=30
             )
             
             response.raise_for_status()
             
+            # Play 16-bit PCM as it arrives
+            chunks = []
+            out_stream = None
+            if play_audio:
+                out_stream = sd.RawOutputStream(
+                    samplerate=Config.ELEVENLABS_SAMPLE_RATE,
+                    channels=1,
+                    dtype="int16"
+                )
+                out_stream.start()
+            
+            try:
+                leftover = b""
+                for chunk in response.iter_content(chunk_size=4096):
+                    if not chunk:
+                        continue
+                    chunks.append(chunk)
+                    if out_stream:
+                        # Only write whole int16 samples
+                        chunk = leftover + chunk
+                        cut = len(chunk) - (len(chunk) % 2)
+                        leftover = chunk[cut:]
+                        out_stream.write(chunk[:cut])
+            finally:
+                if out_stream:
+                    out_stream.stop()
+                    out_stream.close()
+            
+            pcm = b"".join(chunks)
+            
             if save_file:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                audio_path = os.path.join(Config.AUDIO_DIR, f"premium_{timestamp}.mp3")
+                audio_path = os.path.join(Config.AUDIO_DIR, f"premium_{timestamp}.wav")
                 
-                with open(audio_path, "wb") as f:
-                    f.write(response.content)
+                if play_audio:
+                    # Already played - write in the background
+                    threading.Thread(
+                        target=self._save_pcm,
+                        args=(audio_path, pcm),
+                        daemon=True
+                    ).start()
+                else:
+                    self._save_pcm(audio_path, pcm)
                 
                 print(f"✅ Premium audio saved: {audio_path}")
                 return audio_path
             
-            return response.content
+            return pcm
             
         except Exception as e:
             print(f"❌ Premium TTS error: {e}")
             return None
     
+    def _elevenlabs_request(self, text):
+        """Request arguments for the ElevenLabs streaming PCM endpoint"""
+        return {
+            "url": f"{Config.ELEVENLABS_TTS_URL}/{self.elevenlabs_voice}/stream",
+            "params": {
+                "optimize_streaming_latency": 3,
+                "output_format": f"pcm_{Config.ELEVENLABS_SAMPLE_RATE}"
+            },
+            "headers": {
+                "xi-api-key": self.elevenlabs_key,
+                "Content-Type": "application/json"
+            },
+            "json": {
+                "text": text,
+                "model_id": Config.ELEVENLABS_MODEL,
+                "voice_settings": {
+                    "stability": 0.5,
+                    "similarity_boost": 0.75
+                }
+            }
+        }
+    
+    def _play_pcm(self, pcm):
+        """Play raw 16-bit mono PCM (blocking)"""
+        with sd.RawOutputStream(
+            samplerate=Config.ELEVENLABS_SAMPLE_RATE,
+            channels=1,
+            dtype="int16"
+        ) as out_stream:
+            out_stream.write(pcm[:len(pcm) - len(pcm) % 2])
+    
+    def _save_pcm(self, audio_path, pcm):
+        """Write raw 16-bit mono PCM to a WAV file"""
+        try:
+            with wave.open(audio_path, "wb") as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(Config.ELEVENLABS_SAMPLE_RATE)
+                wav_file.writeframes(pcm)
+            _keep_recent_audio(audio_path)
+        except Exception as e:
+            print(f"⚠️ Failed to save premium audio: {e}")
+    
+    def warmup_connection(self):
+        """Open (or refresh) a pooled TLS connection to OpenRouter"""
+        try:
+            self.session.head(self.openrouter_url, timeout=5)
+        except Exception:
+            pass
+    
     def reset_conversation(self):
         """Reset conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
+        self.summary = ""
 
 
 # Test module
@@ -346,7 +1250,7 @@ if __name__ == "__main__":
         print("\n🧪 Testing cloud chat...\n")
         response = cloud.chat(
             "Hello! Respond in one sentence.",
-            system_prompt=Config.get_system_prompt()
+            system_prompt=Config.SYSTEM_PROMPT
         )
         
         if response:
@@ -1,17 +1,17 @@
 """
-Continuous Voice Input using Energy Detection
-Simpler and more robust than VAD
+Continuous Voice Input using WebRTC VAD
+Rejects fan/HVAC noise that a plain energy threshold lets through
 """
 
+import multiprocessing as mp
 import queue
 import threading
 import time
+from multiprocessing import shared_memory
 import numpy as np
 import sounddevice as sd
-import tempfile
-import wave
+import webrtcvad
 import sys
-import os
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
@@ -19,53 +19,141 @@ from config import Config
 from modules.local_stt import LocalSTT
 
 
+def _ring_slice(ring, start, end):
+    """
+    Read samples [start, end) from a ring buffer by absolute position
+    
+    Returns a view when the range does not wrap, otherwise a copy.
+    """
+    size = len(ring)
+    i, n = start % size, end - start
+    if i + n <= size:
+        return ring[i:i + n]
+    return np.concatenate((ring[i:], ring[:i + n - size]))
+
+
+def _stt_worker(shm_name, ring_size, req_q, res_q):
+    """
+    Speech-to-text worker process
+    
+    Loads Whisper once, then transcribes (job_id, start, end) ranges of the
+    shared audio ring until it receives None. Each result is sent back as
+    (job_id, text), with text None if the transcription failed.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((ring_size,), dtype=np.int16, buffer=shm.buf)
+    
+    try:
+        stt = LocalSTT()
+        res_q.put("ready")
+    except Exception as e:
+        res_q.put(e)
+        shm.close()
+        return
+    
+    while True:
+        job = req_q.get()
+        if job is None:
+            break
+        job_id, start, end = job
+        try:
+            # int16 -> float32 in [-1, 1] in a single pass
+            audio = np.multiply(_ring_slice(ring, start, end), 1 / 32768, dtype=np.float32)
+            res_q.put((job_id, stt.transcribe_array(audio)))
+        except Exception as e:
+            print(f"❌ STT worker error: {e}")
+            res_q.put((job_id, None))
+    
+    del ring
+    shm.close()
+
+
 class ContinuousVoiceInput:
-    """Continuous voice input with Energy-based Detection"""
+    """Continuous voice input with WebRTC voice activity detection"""
     
-    def __init__(self, sample_rate=16000, robot_state=None):
+    def __init__(self, sample_rate=16000, robot_state=None, on_interrupt=None):
         """
         Initialize continuous voice input
         
         Args:
             sample_rate: Audio sample rate (16000 for Whisper)
             robot_state: Optional RobotState to check if robot is speaking
+            on_interrupt: Optional callable invoked when the robot and the
+                          user talk over each other (e.g. to cancel the reply stream)
         """
         self.sample_rate = sample_rate
         self.robot_state = robot_state
+        self.on_interrupt = on_interrupt
         
         # Audio settings
         self.block_size = 4000  # 0.25s chunks
-        self.threshold = 0.02   # Volume threshold (adjust if needed)
         self.silence_limit = 2.0 # Seconds of silence to end speech
         
-        # Audio buffer
+        # Voice activity detection (20ms int16 frames)
+        self.vad = webrtcvad.Vad(2)  # Aggressiveness 0-3
+        self.vad_frame = self.sample_rate // 50
+        self.speech_ratio = 0.3  # Fraction of speech frames for a speech chunk
+        self.barge_in_blocks = 3  # Consecutive speech chunks (0.75s) to interrupt the robot
+        
+        # STT worker timeouts (seconds)
+        self.stt_load_timeout = 120  # Whisper model load
+        self.stt_timeout = 30  # One transcription
+        
+        # Audio ring buffer (60s of int16 preallocated in shared memory,
+        # written by the capture callback and read directly by the VAD and
+        # the STT worker)
+        ring_size = self.sample_rate * 60
+        self._shm = shared_memory.SharedMemory(create=True, size=ring_size * 2)
+        self._ring = np.ndarray((ring_size,), dtype=np.int16, buffer=self._shm.buf)
+        self._write_pos = 0  # Total samples written (absolute position)
+        
+        # Queue of (start_pos, frames) markers into the ring
         self.audio_queue = queue.Queue()
         self.is_listening = False
+        self._capture_thread = None
+        self._process_thread = None
         
-        # Initialize Whisper
+        # Whisper runs in its own process so inference never contends
+        # with audio capture for the GIL
         print("🎤 Loading Whisper for continuous listening...")
-        self.stt = LocalSTT()
+        ctx = mp.get_context("spawn")
+        self._stt_req = ctx.Queue()
+        self._stt_res = ctx.Queue()
+        self._stt_proc = ctx.Process(
+            target=_stt_worker,
+            args=(self._shm.name, ring_size, self._stt_req, self._stt_res),
+            daemon=True
+        )
+        self._stt_proc.start()
+        self._stt_job = 0
         
-        print("✅ Continuous voice input initialized (Energy Mode)")
+        status = self._wait_stt_result(self.stt_load_timeout)
+        if status != "ready":
+            if self._stt_proc.is_alive():
+                self._stt_proc.terminate()
+            self._close_shared_memory()
+            raise RuntimeError(f"STT worker failed to start: {status}")
+        
+        print("✅ Continuous voice input initialized (VAD Mode)")
     
     def start_listening(self, callback):
         """Start continuous listening"""
         self.is_listening = True
         
         # Thread 1: Capture audio stream
-        capture_thread = threading.Thread(
+        self._capture_thread = threading.Thread(
             target=self._capture_audio_stream,
             daemon=True
         )
-        capture_thread.start()
+        self._capture_thread.start()
         
         # Thread 2: Process audio
-        process_thread = threading.Thread(
+        self._process_thread = threading.Thread(
             target=self._process_audio_stream,
             args=(callback,),
             daemon=True
         )
-        process_thread.start()
+        self._process_thread.start()
         
         print("🎤 Continuous listening started")
     
@@ -75,76 +163,141 @@ class ContinuousVoiceInput:
         def audio_callback(indata, frames, time_info, status):
             if status:
                 print(f"⚠️ Audio status: {status}")
-            self.audio_queue.put(indata.copy())
+            self._write_ring(indata[:, 0])
         
         with sd.InputStream(
             samplerate=self.sample_rate,
             channels=1,
-            dtype=np.float32,
+            dtype=np.int16,  # PortAudio quantizes; VAD and ring use int16 as-is
             blocksize=self.block_size,
             callback=audio_callback
         ):
             while self.is_listening:
                 time.sleep(0.1)
     
+    def _write_ring(self, samples):
+        """Copy samples into the ring buffer and queue their position"""
+        n = len(samples)
+        size = len(self._ring)
+        start = self._write_pos
+        idx = start % size
+        
+        first = min(n, size - idx)
+        np.copyto(self._ring[idx:idx + first], samples[:first])
+        if first < n:
+            # Wrap around to the start of the ring
+            np.copyto(self._ring[:n - first], samples[first:])
+        
+        self._write_pos = start + n
+        self.audio_queue.put((start, n))
+    
+    def _read_ring(self, start, end):
+        """Read samples [start, end) from the ring buffer"""
+        return _ring_slice(self._ring, start, end)
+    
+    def _is_speech(self, chunk):
+        """
+        Check whether a chunk contains speech
+        
+        Args:
+            chunk: int16 audio samples
+            
+        Returns:
+            bool: True if at least speech_ratio of its 20ms frames are speech
+        """
+        pcm = chunk.tobytes()
+        frame_bytes = self.vad_frame * 2
+        n_frames = len(pcm) // frame_bytes
+        if n_frames == 0:
+            return False
+        
+        voiced = sum(
+            self.vad.is_speech(pcm[i * frame_bytes:(i + 1) * frame_bytes], self.sample_rate)
+            for i in range(n_frames)
+        )
+        return voiced >= self.speech_ratio * n_frames
+    
     def _process_audio_stream(self, callback):
-        """Process audio stream based on volume"""
+        """Process audio stream based on voice activity"""
         
-        speech_buffer = []
+        utt_start = None  # Ring position where the current utterance began
+        utt_end = None
         silence_start = None
         is_speaking = False
+        barge_in_count = 0  # Consecutive speech chunks while the robot talks
+        # Cap utterances at half the ring so capture can keep writing for
+        # as long again while the worker transcribes without overwriting it
+        max_samples = len(self._ring) // 2
         
         while self.is_listening:
             try:
-                # Get audio chunk
-                chunk = self.audio_queue.get(timeout=1)
-                
-                # Calculate volume (RMS)
-                volume = np.sqrt(np.mean(chunk**2))
+                # Get audio chunk position
+                start, frames = self.audio_queue.get(timeout=1)
+                chunk = self._read_ring(start, start + frames)
                 
                 # Check if robot is speaking (Echo Cancellation)
                 if self.robot_state and self.robot_state.is_speaking:
                     if is_speaking:
                         # Abort current recording if robot starts talking
                         is_speaking = False
-                        speech_buffer = []
+                        utt_start = None
                         print("[SKIP] Robot started speaking, aborted user input")
+                        
+                        # User was still talking - stop the reply stream too
+                        if self.on_interrupt:
+                            self.on_interrupt()
+                    
+                    # Barge-in: sustained speech over the robot stops the reply
+                    # (a lone voiced chunk is more likely speaker echo)
+                    if self.on_interrupt and self._is_speech(chunk):
+                        barge_in_count += 1
+                        if barge_in_count >= self.barge_in_blocks:
+                            print("[INTERRUPT] User spoke over the robot")
+                            barge_in_count = 0
+                            self.on_interrupt()
+                    else:
+                        barge_in_count = 0
                     continue
+                
+                barge_in_count = 0
 
                 # Speech Logic
-                if volume > self.threshold:
+                if self._is_speech(chunk):
                     if not is_speaking:
                         print("🗣️ Speech detected...")
                         is_speaking = True
+                        utt_start = start
                     
-                    speech_buffer.append(chunk)
+                    utt_end = start + frames
                     silence_start = None  # Reset silence timer
                     
                 elif is_speaking:
                     # We are in a speech segment, but this chunk is silent
-                    speech_buffer.append(chunk)
+                    utt_end = start + frames
                     
                     if silence_start is None:
                         silence_start = time.time()
+                
+                if not is_speaking:
+                    continue
+                
+                # End on enough silence, or before the utterance outgrows the ring
+                silence_done = (silence_start is not None and
+                                time.time() - silence_start > self.silence_limit)
+                if silence_done or utt_end - utt_start >= max_samples:
+                    print("🔄 Processing speech...")
                     
-                    # Check if silence has lasted long enough
-                    if time.time() - silence_start > self.silence_limit:
-                        print("🔄 Processing speech...")
-                        
-                        # Process the buffer
-                        full_audio = np.concatenate(speech_buffer)
-                        
-                        # Transcribe
-                        text = self._recognize_from_numpy(full_audio)
-                        
-                        if text:
-                            print(f"✅ Recognized: {text}")
-                            callback(text)
-                        
-                        # Reset
-                        is_speaking = False
-                        speech_buffer = []
-                        silence_start = None
+                    # Transcribe straight from the shared ring (no copy)
+                    text = self._recognize_from_ring(utt_start, utt_end)
+                    
+                    if text:
+                        print(f"✅ Recognized: {text}")
+                        callback(text)
+                    
+                    # Reset
+                    is_speaking = False
+                    utt_start = None
+                    silence_start = None
                 
             except queue.Empty:
                 continue
@@ -152,34 +305,84 @@ class ContinuousVoiceInput:
                 print(f"❌ Audio processing error: {e}")
                 continue
     
-    def _recognize_from_numpy(self, audio_data):
-        """Convert numpy array to text using Whisper"""
+    def _wait_stt_result(self, timeout):
+        """
+        Wait for the next message from the STT worker
+        
+        Args:
+            timeout: Seconds to wait before giving up
+            
+        Returns:
+            The worker's message, or None on timeout or if the worker died
+        """
+        deadline = time.time() + timeout
+        while True:
+            try:
+                return self._stt_res.get(timeout=1)
+            except queue.Empty:
+                if not self._stt_proc.is_alive():
+                    print("❌ STT worker process exited")
+                    return None
+                if time.time() >= deadline:
+                    print(f"⚠️ STT worker timed out after {timeout}s")
+                    return None
+    
+    def _recognize_from_ring(self, start, end):
+        """Transcribe ring samples [start, end) in the STT worker"""
         try:
-            # Create temporary WAV file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                tmp_path = tmp_file.name
-                
-                # Write WAV file
-                with wave.open(tmp_path, 'wb') as wav_file:
-                    wav_file.setnchannels(1)
-                    wav_file.setsampwidth(2)  # 16-bit
-                    wav_file.setframerate(self.sample_rate)
-                    # Convert float32 -> int16
-                    audio_int16 = (audio_data * 32767).astype(np.int16)
-                    wav_file.writeframes(audio_int16.tobytes())
+            if not self._stt_proc.is_alive():
+                print("❌ STT worker is not running")
+                return None
             
-            # Transcribe
-            text = self.stt.transcribe_file(tmp_path)
+            self._stt_job += 1
+            job_id = self._stt_job
+            self._stt_req.put((job_id, start, end))
             
-            # Clean up
-            os.unlink(tmp_path)
-            return text
+            while True:
+                result = self._wait_stt_result(self.stt_timeout)
+                if result is None:
+                    return None
+                result_id, text = result
+                # Skip late results of jobs that already timed out
+                if result_id == job_id:
+                    return text
             
         except Exception as e:
             print(f"❌ Recognition error: {e}")
             return None
     
+    def _close_shared_memory(self):
+        """Release the shared audio ring (safe to call more than once)"""
+        if self._shm is None:
+            return
+        self._ring = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+    
     def stop_listening(self):
         """Stop continuous listening"""
         self.is_listening = False
+        
+        # Wait for the capture thread to close its input stream (no more
+        # ring writes) and for the processing thread to finish its chunk;
+        # it may be waiting on a transcription, so the worker stays up
+        current = threading.current_thread()
+        threads_done = True
+        for thread, timeout in ((self._capture_thread, 2),
+                                (self._process_thread, self.stt_timeout + 5)):
+            if thread is not None and thread is not current:
+                thread.join(timeout=timeout)
+                threads_done = threads_done and not thread.is_alive()
+        
+        # Shut down the STT worker
+        if self._stt_proc.is_alive():
+            self._stt_req.put(None)
+            self._stt_proc.join(timeout=5)
+        
+        # Only release the ring once nothing can touch it
+        if threads_done:
+            self._close_shared_memory()
+        else:
+            print("⚠️ Audio threads still running, leaving shared ring in place")
         print("🔇 Continuous listening stopped")
@@ -3,8 +3,13 @@ Hybrid Brain - Intelligent routing between local and cloud models
 Optimizes for speed while maintaining quality
 """
 
+import atexit
+import re
+import threading
 import time
 import sys
+import cv2
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
 # Add parent directory to path for config import
@@ -17,6 +22,13 @@ from config import Config
 # Import local models
 from modules.local_llm import LocalLLM
 
+# libjpeg-turbo for frame encoding (optional, falls back to cv2.imencode)
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
 # Import cloud fallback (optional)
 try:
     from modules.cloud_fallback import CloudFallback
@@ -25,6 +37,15 @@ except ImportError:
     CLOUD_AVAILABLE = False
     print("[WARN] Cloud fallback not available (missing API keys)")
 
+# Returned by analyze_image* when no model could describe the image
+VISION_FAILED = "I couldn't analyze the image."
+
+# Messages that need the stronger cloud model in balanced mode
+_COMPLEX_RE = re.compile(
+    r"\b(?:analyze|complex|detailed|explain in depth|comprehensive|thorough|research|document)",
+    re.IGNORECASE
+)
+
 
 class HybridBrain:
     """
@@ -37,10 +58,29 @@ class HybridBrain:
         
         print("\n[BRAIN] Initializing Hybrid Brain...")
         
+        # One bounded pool for warmup, preload and vision prefetch
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="syca-bg")
+        atexit.register(self._pool.shutdown, wait=False)
+        
+        # System prompt, fixed per session so every request shares its prefix
+        self._system_prompt = Config.get_system_prompt()
+        
+        # Barge-in: set by cancel_stream() to stop the streamed reply
+        self._cancel = threading.Event()
+        
+        # SIMD JPEG encoder for camera frames (needs the libturbojpeg library)
+        self._jpeg = None
+        if TURBOJPEG_AVAILABLE:
+            try:
+                self._jpeg = TurboJPEG()
+            except Exception as e:
+                print(f"[WARN] TurboJPEG not usable, using OpenCV encoder: {e}")
+        
         # Initialize local models (primary)
         try:
-            self.local_llm = LocalLLM()
+            self.local_llm = LocalLLM(pool=self._pool)
             self.local_available = True
+            self.local_llm.warmup(self._system_prompt)
         except Exception as e:
             print(f"[WARN] Local LLM not available: {e}")
             self.local_available = False
@@ -67,7 +107,7 @@ class HybridBrain:
         print(f"   - Cloud: {'[OK]' if self.cloud_available else '[NO]'}")
         print(f"   - Mode: {Config.MODE}")
     
-    def chat(self, message, use_vision_context=False, image_path=None):
+    def chat(self, message, use_vision_context=False, image_path=None, vision_context=None):
         """
         Chat with intelligent routing
         
@@ -75,6 +115,7 @@ class HybridBrain:
             message: User message
             use_vision_context: Include vision context
             image_path: Optional image path
+            vision_context: Precomputed image description (skips analysis)
             
         Returns:
             str: AI response
@@ -83,9 +124,23 @@ class HybridBrain:
         # Determine routing strategy
         use_cloud = self._should_use_cloud(message)
         
+        # Analyze the image once; both routes below reuse the result
+        if image_path and vision_context is None:
+            vision_context = self._vision_context(
+                image_path,
+                warm_cloud=use_cloud or not self.local_available
+            )
+        
+        # Hedged mode: race local against a delayed cloud request
+        if Config.MODE == "hedged" and self.local_available and self.cloud_available:
+            response = self.chat_hedged(message, vision_context=vision_context)
+            if response:
+                return response
+            return "I'm having trouble processing that right now. Please try again."
+        
         # Try local first (unless quality mode forces cloud)
         if not use_cloud and self.local_available:
-            response = self._chat_local(message, image_path)
+            response = self._chat_local(message, vision_context=vision_context)
             if response:
                 self.stats["local_requests"] += 1
                 return response
@@ -95,7 +150,7 @@ class HybridBrain:
         
         # Fallback to cloud
         if self.cloud_available:
-            response = self._chat_cloud(message, image_path)
+            response = self._chat_cloud(message, vision_context=vision_context)
             if response:
                 self.stats["cloud_requests"] += 1
                 return response
@@ -104,7 +159,49 @@ class HybridBrain:
         
         return "I'm having trouble processing that right now. Please try again."
     
-    def chat_stream(self, message, use_vision_context=False, image_path=None):
+    def chat_hedged(self, message, hedge_ms=None, vision_context=None):
+        """
+        Start local chat, and race cloud against it if local hasn't answered
+        within hedge_ms
+        
+        Args:
+            message: User message
+            hedge_ms: Head start for local in ms (default from config)
+            vision_context: Precomputed image description
+            
+        Returns:
+            str: First non-empty response, or None
+        """
+        if hedge_ms is None:
+            hedge_ms = Config.HEDGE_DELAY_MS
+        
+        f_local = self._pool.submit(self._chat_local, message, vision_context=vision_context)
+        pending = {f_local}
+        
+        # Easy queries finish locally inside the delay and never touch cloud
+        done, _ = wait(pending, timeout=hedge_ms / 1000.0)
+        if not (done and f_local.result()):
+            f_cloud = self._pool.submit(self._chat_cloud, message, vision_context=vision_context)
+            pending.add(f_cloud)
+            print("[INFO] Local is slow, hedging with cloud...")
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                response = fut.result()
+                if response:
+                    # Loser keeps running if already started; drop it if queued
+                    for other in pending:
+                        other.cancel()
+                    key = "local_requests" if fut is f_local else "cloud_requests"
+                    self.stats[key] += 1
+                    return response
+                key = "local_failures" if fut is f_local else "cloud_failures"
+                self.stats[key] += 1
+        
+        return None
+    
+    def chat_stream(self, message, use_vision_context=False, image_path=None, vision_context=None):
         """
         Stream chat responses in real-time
         
@@ -112,24 +209,63 @@ class HybridBrain:
             message: User message
             use_vision_context: Include vision context
             image_path: Optional image path
+            vision_context: Description already computed (skips image analysis)
             
         Yields:
             str: Text chunks as they arrive
         """
-        # For now, only cloud supports streaming
+        # Reset at call time, not on the generator's first next(), so a
+        # barge-in that lands before streaming starts is not lost
+        self._cancel.clear()
+        return self._chat_stream_iter(
+            message, use_vision_context, image_path, vision_context, self._cancel
+        )
+    
+    def _chat_stream_iter(self, message, use_vision_context, image_path, vision_context, cancel_token):
+        """Generator behind chat_stream()"""
+        use_cloud = self._should_use_cloud(message)
+        
+        # Inject vision context if provided (analyzed once, reused on fallback)
+        if vision_context is None and image_path and (self.local_available or self.cloud_available):
+            vision_context = self._vision_context(
+                image_path,
+                warm_cloud=use_cloud or not self.local_available
+            )
+        prompt = self._with_vision(message, vision_context)
+        
+        # Stream from local LLM first (unless routing prefers cloud)
+        if not use_cloud and self.local_available:
+            streamed = False
+            for chunk in self.local_llm.chat_stream(
+                prompt,
+                system_prompt=self._system_prompt,
+                cancel_token=cancel_token
+            ):
+                streamed = True
+                yield chunk
+            
+            # Interrupted: don't fall through to the cloud
+            if cancel_token.is_set():
+                return
+            
+            if streamed:
+                self.stats["local_requests"] += 1
+                return
+            self.stats["local_failures"] += 1
+            print("[WARN] Local stream failed, trying cloud...")
+        
         if self.cloud_available:
             try:
-                # Inject vision context if provided
-                if image_path:
-                    vision_context = self.analyze_image(image_path, "Describe this image in detail.")
-                    if vision_context:
-                        print(f"👁️ Vision Context: {vision_context[:50]}...")
-                        message = f"[SYSTEM: You see the following: {vision_context}]\n\nUser: {message}"
-                
                 # Stream from cloud
-                for chunk in self.cloud.chat_stream(message, system_prompt=Config.get_system_prompt()):
+                for chunk in self.cloud.chat_stream(
+                    prompt,
+                    system_prompt=self._system_prompt,
+                    cancel_token=cancel_token
+                ):
                     yield chunk
-                    
+                
+                if cancel_token.is_set():
+                    return
                 self.stats["cloud_requests"] += 1
                 return
             except Exception as e:
@@ -137,17 +273,30 @@ class HybridBrain:
                 self.stats["cloud_failures"] += 1
         
         # Fallback to non-streaming
-        response = self.chat(message, use_vision_context, image_path)
+        response = self.chat(message, use_vision_context, image_path, vision_context=vision_context)
         if response:
             yield response
     
-    def analyze_image(self, image_path, question="What do you see?"):
+    def refresh_system_prompt(self):
+        """Re-read the system prompt from config (invalidates prefix caches)"""
+        self._system_prompt = Config.get_system_prompt()
+        if self.local_available:
+            self.local_llm.warmup(self._system_prompt)
+    
+    def cancel_stream(self):
+        """Abort an in-flight streamed response (local or cloud)"""
+        self._cancel.set()
+        if self.cloud_available:
+            self.cloud.cancel_stream()
+    
+    def analyze_image(self, image_path, question="What do you see?", image_bytes=None):
         """
         Analyze image with intelligent routing
         
         Args:
             image_path: Path to image
             question: Question about image
+            image_bytes: JPEG bytes already in memory (skips the file)
             
         Returns:
             str: Vision analysis
@@ -156,7 +305,7 @@ class HybridBrain:
         # Try local vision first
         if self.local_available:
             start_time = time.time()
-            result = self.local_llm.analyze_image(image_path, question)
+            result = self.local_llm.analyze_image(image_path, question, image_bytes=image_bytes)
             elapsed = time.time() - start_time
             
             if result:
@@ -170,7 +319,7 @@ class HybridBrain:
         # Fallback to cloud
         if self.cloud_available:
             start_time = time.time()
-            result = self.cloud.analyze_image(image_path, question)
+            result = self.cloud.analyze_image(image_path, question, image_bytes=image_bytes)
             elapsed = time.time() - start_time
             
             if result:
@@ -180,7 +329,58 @@ class HybridBrain:
             else:
                 self.stats["cloud_failures"] += 1
         
-        return "I couldn't analyze the image."
+        return VISION_FAILED
+    
+    def analyze_image_array(self, frame, question="What do you see?"):
+        """
+        Analyze a camera frame held in memory
+        
+        Args:
+            frame: BGR image array (e.g. from Vision.read())
+            question: Question about image
+            
+        Returns:
+            str: Vision analysis
+        """
+        # Vision models work at a few hundred pixels; shrink before encoding
+        h, w = frame.shape[:2]
+        scale = Config.VISION_FRAME_MAX_SIDE / max(h, w)
+        if scale < 1:
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        
+        jpg_bytes = self._encode_jpeg(frame)
+        if jpg_bytes is None:
+            return VISION_FAILED
+        return self.analyze_image_bytes(jpg_bytes, question)
+    
+    def analyze_image_bytes(self, jpg_bytes, question="What do you see?"):
+        """
+        Analyze an encoded image held in memory (no file)
+        
+        Args:
+            jpg_bytes: JPEG bytes
+            question: Question about image
+            
+        Returns:
+            str: Vision analysis
+        """
+        return self.analyze_image(None, question, image_bytes=jpg_bytes)
+    
+    def _encode_jpeg(self, frame, quality=80):
+        """
+        JPEG-encode a BGR frame (TurboJPEG when available)
+        
+        Returns:
+            bytes: JPEG data, or None on failure
+        """
+        if self._jpeg is not None:
+            try:
+                return self._jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+            except Exception as e:
+                print(f"[WARN] TurboJPEG encode failed: {e}")
+        
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buf.tobytes() if ok else None
     
     def _should_use_cloud(self, message):
         """
@@ -202,44 +402,69 @@ class HybridBrain:
             return False
         
         # Balanced mode: analyze complexity
-        complexity_keywords = [
-            "analyze", "complex", "detailed", "explain in depth",
-            "comprehensive", "thorough", "research", "document"
-        ]
-        
-        message_lower = message.lower()
-        is_complex = any(kw in message_lower for kw in complexity_keywords)
+        is_complex = _COMPLEX_RE.search(message) is not None
         
         # Use cloud for complex queries if available
         return is_complex and self.cloud_available
     
-    def _chat_local(self, message, image_path=None):
+    def _vision_context(self, image_path, warm_cloud=False):
+        """
+        Describe an image for prompt injection
+        
+        Args:
+            image_path: Path to image
+            warm_cloud: Warm the cloud connection while vision runs
+            
+        Returns:
+            str: Vision description
+        """
+        fut_vision = self._pool.submit(self.analyze_image, image_path, "Describe this image in detail.")
+        if warm_cloud and self.cloud_available:
+            self._pool.submit(self.cloud.warmup_connection)
+        
+        vision_context = fut_vision.result()
+        if vision_context:
+            print(f"👁️ Vision Context: {vision_context[:50]}...")
+        return vision_context
+    
+    def _with_vision(self, message, vision_context):
+        """Prefix the user message with what the robot sees"""
+        if not vision_context:
+            return message
+        # CRITICAL: Inject vision directly into user message to force acknowledgement
+        return f"[SYSTEM: You see the following: {vision_context}]\n\nUser: {message}"
+    
+    def _chat_local(self, message, image_path=None, vision_context=None):
         """Chat using local LLM"""
         try:
-            if image_path:
+            if image_path and vision_context is None:
                 return self.local_llm.chat_with_vision(message, image_path)
             else:
                 return self.local_llm.chat(
-                    message,
-                    system_prompt=Config.get_system_prompt()
+                    self._with_vision(message, vision_context),
+                    system_prompt=self._system_prompt
                 )
         except Exception as e:
             print(f"[ERROR] Local chat error: {e}")
             return None
     
-    def _chat_cloud(self, message, image_path=None):
+    def _chat_cloud(self, message, image_path=None, vision_context=None):
         """Chat using cloud fallback"""
         
-        # If image provided, get vision analysis first
-        vision_context = ""
-        if image_path:
-            vision_context = self.analyze_image(image_path, "Describe this image in detail.")
-            if vision_context:
-                print(f"👁️ Vision Context: {vision_context[:50]}...")
-                # CRITICAL: Inject vision directly into user message to force acknowledgement
-                message = f"[SYSTEM: You see the following: {vision_context}]\n\nUser: {message}"
+        # If image provided, run vision while the cloud connection warms up
+        if image_path and vision_context is None:
+            vision_context = self._vision_context(image_path, warm_cloud=True)
         
-        return self.cloud.chat(message, system_prompt=Config.get_system_prompt())
+        return self.cloud.chat(
+            self._with_vision(message, vision_context),
+            system_prompt=self._system_prompt
+        )
+    
+    def close(self):
+        """Release model client resources"""
+        if self.local_available:
+            self.local_llm.close()
+        self._pool.shutdown(wait=False)
     
     def reset_conversation(self):
         """Reset conversation history"""
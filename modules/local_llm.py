@@ -4,30 +4,98 @@ Fast chat and vision capabilities running locally
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import base64
+import mmap
 import os
 import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 from config import Config
 
+# Ollama health checks: host -> (monotonic time, reachable)
+_health_cache = {}
+_HEALTH_TTL = 5.0
+
+# Fast JSON for request bodies and the streaming hot path (optional)
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    _dumps = lambda obj: json.dumps(obj).encode("utf-8")
+    _loads = json.loads
+
+# SIMD hashing for the vision result cache (optional)
+try:
+    from blake3 import blake3 as _image_hash
+except ImportError:
+    from hashlib import blake2b as _image_hash
+
+
+@lru_cache(maxsize=8)
+def _encode_image(image_path, mtime_ns, size):
+    """Base64-encode an image file via mmap (cached per path/mtime/size)"""
+    # Encoding straight from the page cache skips the read() copy
+    with open(image_path, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return base64.b64encode(mm).decode("ascii")
+
+
+@lru_cache(maxsize=8)
+def _image_digest(image_path, mtime_ns, size):
+    """Content hash of an image file (cached per path/mtime/size)"""
+    h = _image_hash()
+    with open(image_path, "rb", buffering=1 << 20) as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.digest()
+
 
 class LocalLLM:
     """Local LLM interface using Ollama"""
     
-    def __init__(self, host=None):
+    def __init__(self, host=None, pool=None):
         """
         Initialize Ollama client
         
         Args:
             host: Ollama host URL (default from config)
+            pool: Executor for background warmup work (default: own threads)
         """
-        self.host = host or Config.OLLAMA_HOST
+        # Ollama listens on IPv4 loopback; naming it directly skips the
+        # localhost lookup and the failed ::1 attempt on every new connection
+        self.host = (host or Config.OLLAMA_HOST).replace("://localhost", "://127.0.0.1", 1)
+        self._pool = pool
         self.chat_model = Config.OLLAMA_CHAT_MODEL
         self.vision_model = Config.OLLAMA_VISION_MODEL
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=10)
+        # Token count of the system prompt, learned from warmup()
+        self.system_tokens = 0
+        # Pinned system message for the Ollama payload (see _build_messages)
+        self._sys_msg = None
+        # Vision answers keyed by (image content hash, question)
+        self._vision_cache = OrderedDict()
+        self._vision_lock = threading.Lock()
+        # Set by cancel_stream() to abort the in-flight chat_stream
+        self._cancel = threading.Event()
+        
+        # Persistent keep-alive session for all Ollama calls
+        self.session = requests.Session()
+        self.session.mount(
+            "http://",
+            HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+        )
+        self.session.headers.update({
+            "Connection": "keep-alive",
+            "Content-Type": "application/json"
+        })
         
         # Check if Ollama is running
         if not self._check_ollama():
@@ -36,17 +104,126 @@ class LocalLLM:
                 "💡 Make sure Ollama is running: 'ollama serve'"
             )
         
+        # Load model weights into memory before the first request
+        self._preload_models()
+        
         print(f"✅ Ollama connected ({self.host})")
         print(f"   • Chat model: {self.chat_model}")
         print(f"   • Vision model: {self.vision_model}")
     
     def _check_ollama(self):
-        """Check if Ollama is running"""
-        try:
-            response = requests.get(f"{self.host}/api/tags", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
+        """Check if Ollama is running (result cached per host for a few seconds)"""
+        now = time.monotonic()
+        cached = _health_cache.get(self.host)
+        if cached and now - cached[0] < _HEALTH_TTL:
+            return cached[1]
+        
+        # Quick probe first; one slower retry before declaring it dead
+        ok = False
+        for timeout in ((0.25, 0.5), 2):
+            try:
+                response = self.session.get(f"{self.host}/api/tags", timeout=timeout)
+                ok = response.status_code == 200
+                break
+            except Exception:
+                continue
+        
+        _health_cache[self.host] = (now, ok)
+        return ok
+    
+    def _background(self, fn, *args):
+        """Run fn on the shared pool if we were given one, else a daemon thread"""
+        if self._pool is not None:
+            self._pool.submit(fn, *args)
+        else:
+            threading.Thread(target=fn, args=args, daemon=True).start()
+    
+    def _preload_models(self):
+        """Load chat and vision models in the background (empty prompts)"""
+        def _load(model):
+            try:
+                self.session.post(
+                    f"{self.host}/api/generate",
+                    data=_dumps({
+                        "model": model,
+                        "prompt": "",
+                        "keep_alive": Config.OLLAMA_KEEP_ALIVE
+                    }),
+                    timeout=120
+                ).raise_for_status()
+            except Exception as e:
+                print(f"⚠️ Could not preload {model}: {e}")
+        
+        for model in {self.chat_model, self.vision_model}:
+            self._background(_load, model)
+    
+    def warmup(self, system_prompt=None):
+        """
+        Prefill the system prompt in the background so Ollama holds its
+        KV cache before the first real turn
+        
+        Args:
+            system_prompt: System prompt to prefill (default from config)
+        """
+        system_prompt = system_prompt or Config.get_system_prompt()
+        
+        def _run():
+            try:
+                response = self.session.post(
+                    f"{self.host}/api/chat",
+                    data=_dumps({
+                        "model": self.chat_model,
+                        "messages": [{"role": "system", "content": system_prompt}],
+                        "stream": False,
+                        "keep_alive": Config.OLLAMA_KEEP_ALIVE
+                    }),
+                    timeout=60
+                )
+                response.raise_for_status()
+                self.system_tokens = _loads(response.content).get("prompt_eval_count", 0)
+                print(f"🔥 Ollama warmed up ({self.system_tokens} prompt tokens cached)")
+            except Exception as e:
+                print(f"⚠️ Ollama warmup failed: {e}")
+        
+        self._background(_run)
+    
+    def _build_messages(self, message, system_prompt=None):
+        """Assemble system prompt, history and the new user message"""
+        # History dicts are shared, not copied; the system message is
+        # built once per distinct prompt
+        if not system_prompt:
+            head = ()
+        else:
+            if self._sys_msg is None or self._sys_msg["content"] != system_prompt:
+                self._sys_msg = {"role": "system", "content": system_prompt}
+            head = (self._sys_msg,)
+        
+        return [*head, *self.conversation_history, {"role": "user", "content": message}]
+    
+    def _chat_payload(self, message, system_prompt, stream):
+        """Request body for /api/chat"""
+        payload = {
+            "model": self.chat_model,
+            "messages": self._build_messages(message, system_prompt),
+            "stream": stream,
+            "keep_alive": Config.OLLAMA_KEEP_ALIVE
+        }
+        # Pin the warmed-up system prompt in the context; otherwise leave
+        # the model's own num_keep alone
+        if system_prompt and self.system_tokens > 0:
+            payload["options"] = {"num_keep": self.system_tokens}
+        return payload
+    
+    def _remember(self, message, assistant_message):
+        """Append a completed turn to the conversation history"""
+        self.conversation_history.append({
+            "role": "user",
+            "content": message
+        })
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": assistant_message
+        })
     
     def chat(self, message, system_prompt=None, stream=False):
         """
@@ -60,70 +237,31 @@ class LocalLLM:
         Returns:
             str: AI response
         """
+        if stream:
+            # Print chunks as they arrive, return the full reply
+            full_response = ""
+            for chunk in self.chat_stream(message, system_prompt):
+                full_response += chunk
+                print(chunk, end="", flush=True)
+            print()  # New line after streaming
+            return full_response or None
+        
         try:
-            # Build messages
-            messages = []
-            
-            # Add system prompt if provided
-            if system_prompt:
-                messages.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
-            
-            # Add conversation history
-            messages.extend(self.conversation_history)
-            
-            # Add user message
-            messages.append({
-                "role": "user",
-                "content": message
-            })
-            
             # Call Ollama API
-            response = requests.post(
+            response = self.session.post(
                 f"{self.host}/api/chat",
-                json={
-                    "model": self.chat_model,
-                    "messages": messages,
-                    "stream": stream
-                },
+                data=_dumps(self._chat_payload(message, system_prompt, False)),
                 timeout=30
             )
             
             response.raise_for_status()
             
             # Parse response
-            if stream:
-                # Handle streaming response
-                full_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        data = json.loads(line)
-                        if "message" in data:
-                            chunk = data["message"].get("content", "")
-                            full_response += chunk
-                            print(chunk, end="", flush=True)
-                print()  # New line after streaming
-                assistant_message = full_response
-            else:
-                # Handle non-streaming response
-                result = response.json()
-                assistant_message = result["message"]["content"]
+            result = _loads(response.content)
+            assistant_message = result["message"]["content"]
             
             # Update conversation history
-            self.conversation_history.append({
-                "role": "user",
-                "content": message
-            })
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
-            })
-            
-            # Keep history manageable (last 10 messages)
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
+            self._remember(message, assistant_message)
             
             return assistant_message
             
@@ -131,38 +269,132 @@ class LocalLLM:
             print(f"❌ Chat error: {e}")
             return None
     
-    def analyze_image(self, image_path, question="What do you see in this image?"):
+    def chat_stream(self, message, system_prompt=None, cancel_token=None):
+        """
+        Stream a chat response from the local LLM
+        
+        Args:
+            message: User message
+            system_prompt: System prompt (optional)
+            cancel_token: Optional threading.Event; when set, the request is
+                          closed early (defaults to the one cancel_stream() sets)
+            
+        Yields:
+            str: Text chunks as they arrive
+        """
+        # Reset the token here rather than inside the generator, which only
+        # starts on the first next(): a cancel arriving in between must stick
+        if cancel_token is None:
+            cancel_token = self._cancel
+            cancel_token.clear()
+        return self._chat_stream_iter(message, system_prompt, cancel_token)
+    
+    def _chat_stream_iter(self, message, system_prompt, cancel_token):
+        """Generator behind chat_stream()"""
+        
+        full_response = ""
+        try:
+            with self.session.post(
+                f"{self.host}/api/chat",
+                data=_dumps(self._chat_payload(message, system_prompt, True)),
+                timeout=30,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                
+                # Parse whatever NDJSON lines arrived in each network read as
+                # one batch, and yield their text together
+                pending = b""
+                done = False
+                for block in response.iter_content(chunk_size=None):
+                    if cancel_token.is_set():
+                        # Closing the connection makes Ollama stop generating
+                        response.close()
+                        print("[SKIP] Local stream cancelled")
+                        return
+                    *lines, pending = (pending + block).split(b"\n")
+                    parts = []
+                    for line in lines:
+                        if not line:
+                            continue
+                        data = _loads(line)
+                        parts.append(data.get("message", {}).get("content", ""))
+                        if data.get("done"):
+                            done = True
+                            break
+                    chunk = "".join(parts)
+                    if chunk:
+                        full_response += chunk
+                        yield chunk
+                    if done:
+                        break
+        except Exception as e:
+            print(f"❌ Chat stream error: {e}")
+        
+        # Update conversation history
+        if full_response:
+            self._remember(message, full_response)
+    
+    def cancel_stream(self):
+        """Abort the in-flight chat_stream (e.g. when the user interrupts)"""
+        self._cancel.set()
+    
+    def analyze_image(self, image_path, question="What do you see in this image?", image_bytes=None):
         """
         Analyze image using vision model
         
         Args:
             image_path: Path to image file
             question: Question about the image
+            image_bytes: Encoded image already in memory (used instead of the path)
             
         Returns:
             str: Vision analysis
         """
         try:
-            # Read and encode image
-            with open(image_path, "rb") as f:
-                image_data = base64.b64encode(f.read()).decode("utf-8")
+            if image_bytes is None:
+                st = os.stat(image_path)
+                digest = _image_digest(image_path, st.st_mtime_ns, st.st_size)
+            else:
+                digest = _image_hash(image_bytes).digest()
+            
+            # Same picture, same question: reuse the earlier answer
+            key = (digest, question)
+            with self._vision_lock:
+                if key in self._vision_cache:
+                    self._vision_cache.move_to_end(key)
+                    return self._vision_cache[key]
+            
+            # Read and encode image (reuses the last encode of an unchanged file)
+            if image_bytes is None:
+                image_data = _encode_image(image_path, st.st_mtime_ns, st.st_size)
+            else:
+                image_data = base64.b64encode(image_bytes).decode("ascii")
             
             # Call Ollama vision API
-            response = requests.post(
+            response = self.session.post(
                 f"{self.host}/api/generate",
-                json={
+                data=_dumps({
                     "model": self.vision_model,
                     "prompt": question,
                     "images": [image_data],
-                    "stream": False
-                },
+                    "stream": False,
+                    "keep_alive": Config.OLLAMA_KEEP_ALIVE
+                }),
                 timeout=30
             )
             
             response.raise_for_status()
-            result = response.json()
+            result = _loads(response.content).get("response", "").strip()
+            
+            if result:
+                with self._vision_lock:
+                    self._vision_cache[key] = result
+                    self._vision_cache.move_to_end(key)
+                    if len(self._vision_cache) > Config.VISION_RESULT_CACHE_SIZE:
+                        self._vision_cache.popitem(last=False)
             
-            return result.get("response", "").strip()
+            return result
             
         except Exception as e:
             print(f"❌ Vision error: {e}")
@@ -196,15 +428,15 @@ class LocalLLM:
     
     def reset_conversation(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
         print("🔄 Conversation reset")
     
     def list_models(self):
         """List available Ollama models"""
         try:
-            response = requests.get(f"{self.host}/api/tags")
+            response = self.session.get(f"{self.host}/api/tags")
             response.raise_for_status()
-            models = response.json().get("models", [])
+            models = _loads(response.content).get("models", [])
             
             print("\n📋 Available Ollama models:")
             for model in models:
@@ -215,6 +447,10 @@ class LocalLLM:
             print(f"❌ Error listing models: {e}")
             return []
     
+    def close(self):
+        """Close the HTTP session"""
+        self.session.close()
+    
     def get_model_info(self):
         """Get model information"""
         return {
@@ -248,7 +484,7 @@ if __name__ == "__main__":
         print("\n🧪 Testing chat...\n")
         response = llm.chat(
             "Hello! Introduce yourself in one sentence.",
-            system_prompt=Config.get_system_prompt()
+            system_prompt=Config.SYSTEM_PROMPT
         )
         
         if response:
@@ -1,17 +1,26 @@
 """
-Local Speech-to-Text using OpenAI Whisper
+Local Speech-to-Text using faster-whisper (CTranslate2)
 Fast, accurate, and runs entirely offline
 """
 
-import whisper
+from faster_whisper import WhisperModel
+import ctranslate2
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
 import tempfile
 import os
 import sys
+import threading
+from math import gcd
 from pathlib import Path
 
+try:
+    from scipy.signal import resample_poly
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
 # Add parent directory to path for config import
 parent_dir = str(Path(__file__).resolve().parent.parent)
 if parent_dir not in sys.path:
@@ -33,15 +42,43 @@ class LocalSTT:
         """
         self.model_name = model_name or Config.WHISPER_MODEL
         self.device = device or Config.WHISPER_DEVICE
+        if self.device == "auto":
+            self.device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        
+        self.compute_type = Config.WHISPER_COMPUTE_TYPE or self._default_compute_type()
         
-        print(f"[STT] Loading Whisper model '{self.model_name}' on {self.device}...")
+        print(f"[STT] Loading Whisper model '{self.model_name}' on {self.device} ({self.compute_type})...")
         
         try:
-            self.model = whisper.load_model(self.model_name, device=self.device)
+            self.model = WhisperModel(
+                self.model_name,
+                device=self.device,
+                compute_type=self.compute_type,
+                num_workers=2
+            )
             print(f"[OK] Whisper ready ({self.model_name})")
         except Exception as e:
             print(f"[ERROR] Failed to load Whisper: {e}")
             raise
+        
+        # Pay first-call kernel/allocator setup off the critical path
+        if Config.WHISPER_WARMUP:
+            threading.Thread(target=self._warmup, daemon=True).start()
+    
+    def _warmup(self):
+        """Transcribe one second of silence"""
+        try:
+            self._transcribe(np.zeros(16000, dtype=np.float32))
+        except Exception as e:
+            print(f"[WARN] Whisper warmup failed: {e}")
+    
+    def _default_compute_type(self):
+        """int8 on CPU; bf16 on CUDA where supported, otherwise fp16"""
+        if self.device == "cpu":
+            return "int8"
+        if "bfloat16" in ctranslate2.get_supported_compute_types(self.device):
+            return "bfloat16"
+        return "float16"
     
     def transcribe_file(self, audio_path, language="en"):
         """
@@ -55,12 +92,39 @@ class LocalSTT:
             str: Transcribed text
         """
         try:
-            result = self.model.transcribe(
-                audio_path,
-                language=language,
-                fp16=False  # Use fp32 for CPU compatibility
-            )
-            return result["text"].strip()
+            return self._transcribe(audio_path, language)
+        except Exception as e:
+            print(f"[ERROR] Transcription error: {e}")
+            return None
+    
+    def _transcribe(self, audio, language="en", vad_filter=False, **kwargs):
+        """Run the model and join the segment texts"""
+        segments, _ = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=1,
+            vad_filter=vad_filter,
+            **kwargs
+        )
+        return " ".join(s.text.strip() for s in segments).strip()
+    
+    def transcribe_array(self, audio, language="en", sample_rate=16000):
+        """
+        Transcribe a float32 array without touching disk
+        
+        Args:
+            audio: float32 numpy array in range [-1, 1]
+            language: Language code (default: en)
+            sample_rate: Sample rate of audio (resampled to 16kHz if different)
+            
+        Returns:
+            str: Transcribed text
+        """
+        try:
+            if sample_rate != 16000:
+                audio = self._resample(audio, sample_rate, 16000)
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+            return self._transcribe(audio, language)
         except Exception as e:
             print(f"[ERROR] Transcription error: {e}")
             return None
@@ -80,27 +144,29 @@ class LocalSTT:
         try:
             # Whisper expects float32 in range [-1, 1]
             if audio_data.dtype == np.int16:
-                audio_data = audio_data.astype(np.float32) / 32768.0
+                audio_data = np.multiply(audio_data, np.float32(1 / 32768.0), dtype=np.float32)
             
             # Resample to 16kHz if needed (Whisper requirement)
             if sample_rate != 16000:
-                # Simple resampling (for production, use librosa.resample)
                 audio_data = self._resample(audio_data, sample_rate, 16000)
             
             # Transcribe
-            result = self.model.transcribe(
-                audio_data, 
-                language=language,
-                fp16=False,
+            return self._transcribe(
+                np.ascontiguousarray(audio_data, dtype=np.float32),
+                language,
+                vad_filter=True,
                 initial_prompt=f"Hello, my name is {Config.ROBOT_NAME}. I am a robot assistant."
             )
-            return result["text"].strip()
         except Exception as e:
             print(f"❌ Transcription error: {e}")
             return None
     
     def _resample(self, audio, orig_sr, target_sr):
-        """Simple resampling (basic implementation)"""
+        """Polyphase resampling (linear interpolation if scipy is missing)"""
+        if SCIPY_AVAILABLE:
+            g = gcd(orig_sr, target_sr)
+            return resample_poly(audio, target_sr // g, orig_sr // g).astype(np.float32)
+        
         duration = len(audio) / orig_sr
         target_length = int(duration * target_sr)
         indices = np.linspace(0, len(audio) - 1, target_length)
@@ -117,23 +183,40 @@ class LocalSTT:
         Returns:
             str: Transcribed text
         """
-        print(f"[STT] Recording for {duration} seconds...")
-        
         try:
-            # Record audio
+            # Record audio into a preallocated buffer, 100ms blocks at a time
             sample_rate = 16000
-            audio_data = sd.rec(
-                int(duration * sample_rate),
+            audio_data = np.zeros(int(duration * sample_rate), dtype=np.float32)
+            filled = 0
+            done = threading.Event()
+            
+            def callback(indata, frames, time_info, status):
+                nonlocal filled
+                n = min(frames, len(audio_data) - filled)
+                audio_data[filled:filled + n] = indata[:n, 0]
+                filled += n
+                if filled >= len(audio_data):
+                    done.set()
+                    raise sd.CallbackStop
+            
+            stream = sd.InputStream(
                 samplerate=sample_rate,
                 channels=1,
-                dtype=np.float32
+                dtype="float32",
+                blocksize=sample_rate // 10,
+                callback=callback,
+                finished_callback=done.set
             )
-            sd.wait()
+            
+            # Device is open and running before we tell the user to speak
+            with stream:
+                print(f"[STT] Recording for {duration} seconds...")
+                done.wait(duration + 1.0)
             
             print("[STT] Transcribing...")
             
             # Transcribe
-            text = self.transcribe_numpy(audio_data.flatten(), sample_rate, language)
+            text = self.transcribe_numpy(audio_data[:filled], sample_rate, language)
             
             if text:
                 print(f"[OK] Recognized: {text}")
@@ -151,5 +234,6 @@ class LocalSTT:
         return {
             "model": self.model_name,
             "device": self.device,
-            "languages": whisper.tokenizer.LANGUAGES
+            "compute_type": self.compute_type,
+            "languages": self.model.supported_languages
         }
@@ -6,13 +6,17 @@ Fast, natural-sounding, and runs entirely offline
 import os
 import sys
 import re
+import hashlib
 import threading
 import queue as queue_module
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
+import torch
 from TTS.api import TTS
 
 # Add parent directory to path for config import
@@ -22,6 +26,17 @@ if parent_dir not in sys.path:
 
 from config import Config
 
+# Sentence boundaries (split keeps the punctuation, find marks the end)
+_SENT_END_STRIP = re.compile(r'(?<=[.!?])\s+')
+_SENT_END_FIND = re.compile(r'[.!?]\s+')
+
+# ONNX Runtime backend for VITS models (optional)
+try:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
 try:
     from modules.cloud_fallback import CloudFallback
     CLOUD_AVAILABLE = True
@@ -44,6 +59,33 @@ class LocalTTS:
         self.use_gpu = use_gpu if use_gpu is not None else Config.TTS_USE_GPU
         self.audio_dir = Config.AUDIO_DIR
         
+        # Utterance cache: key -> (samples, sample_rate), or None if only on disk.
+        # Survives restarts through the WAV files in cache_dir; decoded clips
+        # in memory are capped at TTS_CACHE_MEMORY_MB.
+        self.cache_dir = os.path.join(self.audio_dir, "cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_bytes = 0  # Size of the decoded clips held in memory
+        cached_files = sorted(
+            (e for e in os.scandir(self.cache_dir) if e.name.endswith(".wav")),
+            key=lambda e: e.stat().st_mtime
+        )
+        for entry in cached_files:
+            self._cache[entry.name[:-4]] = None
+        self._cleanup_old_audio()
+        
+        # Synthesizes the next sentence while the current one plays
+        self._synth_pool = ThreadPoolExecutor(max_workers=1)
+        
+        # Writes streamed clips to the disk cache off the playback path
+        self._persist_pool = ThreadPoolExecutor(max_workers=1)
+        
+        # Long-lived output streams, one per sample rate (Coqui and
+        # ElevenLabs differ), so playback skips device open/close
+        self._out_streams = {}
+        self._out_lock = threading.Lock()
+        
         # Initialize Cloud Fallback for ElevenLabs
         self.cloud = None
         if CLOUD_AVAILABLE and Config.ELEVENLABS_API_KEY:
@@ -62,6 +104,87 @@ class LocalTTS:
             print(f"[ERROR] Failed to load TTS: {e}")
             print("[TIP] Run 'tts --list_models' to see available models")
             raise
+        
+        # Optional ONNX Runtime inference (falls back to PyTorch)
+        self.onnx = False
+        if Config.TTS_BACKEND == "onnx":
+            self.onnx = self._load_onnx()
+        elif Config.TTS_COMPILE:
+            self._compile_model()
+    
+    def _load_onnx(self):
+        """
+        Export the model to ONNX once (int8-quantized for CPU) and load it
+        into ONNX Runtime
+        
+        Returns:
+            bool: True if ONNX inference is active
+        """
+        if not ONNX_AVAILABLE:
+            print("[WARN] onnxruntime not installed, using PyTorch TTS")
+            return False
+        
+        model = self.tts.synthesizer.tts_model
+        if not hasattr(model, "export_onnx"):
+            print(f"[WARN] {self.model_name} has no ONNX export (VITS only), using PyTorch TTS")
+            return False
+        
+        try:
+            name = self.model_name.replace("/", "--")
+            fp32_path = os.path.join(Config.MODEL_DIR, f"{name}.onnx")
+            int8_path = os.path.join(Config.MODEL_DIR, f"{name}.int8.onnx")
+            
+            if not os.path.exists(fp32_path):
+                print("[TTS] Exporting model to ONNX (one-time)...")
+                model.export_onnx(output_path=fp32_path)
+            
+            # int8 weights on CPU; CUDA keeps the float model
+            onnx_path = fp32_path
+            if not self.use_gpu:
+                if not os.path.exists(int8_path):
+                    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+                onnx_path = int8_path
+            
+            model.load_onnx(onnx_path, cuda=self.use_gpu)
+            print(f"[OK] ONNX TTS backend ({os.path.basename(onnx_path)})")
+            return True
+        except Exception as e:
+            print(f"[WARN] ONNX TTS setup failed, using PyTorch TTS: {e}")
+            return False
+    
+    def _compile_model(self):
+        """torch.compile the model and vocoder inference, then warm them up"""
+        if not hasattr(torch, "compile"):
+            print("[WARN] torch.compile needs PyTorch 2.x, skipping")
+            return
+        
+        synthesizer = self.tts.synthesizer
+        try:
+            # The synthesizer calls .inference(), not forward(), so compile
+            # that; dynamic shapes avoid a recompile per utterance length
+            for model in (synthesizer.tts_model, synthesizer.vocoder_model):
+                if model is not None:
+                    model.inference = torch.compile(
+                        model.inference,
+                        mode="reduce-overhead",
+                        dynamic=True
+                    )
+            
+            print("[TTS] Compiling model (one-time warmup)...")
+            self.tts.tts(text="Warming up.")
+            print("[OK] TTS compiled")
+        except Exception as e:
+            print(f"[WARN] torch.compile failed, using eager TTS: {e}")
+            for model in (synthesizer.tts_model, synthesizer.vocoder_model):
+                if model is not None and "inference" in vars(model):
+                    del model.inference
+    
+    def _onnx_synth(self, text):
+        """Run one utterance through the ONNX Runtime session"""
+        model = self.tts.synthesizer.tts_model
+        ids = np.asarray([model.tokenizer.text_to_ids(text)], dtype=np.int64)
+        wav = np.asarray(model.inference_onnx(ids), dtype=np.float32).ravel()
+        return wav, self.tts.synthesizer.output_sample_rate
     
     def speak(self, text, save_file=True, play_audio=True):
         """
@@ -80,50 +203,172 @@ class LocalTTS:
             
             # 1. Try ElevenLabs first (if configured)
             if self.cloud and Config.ELEVENLABS_API_KEY:
+                key = self._cache_key(text, premium=True)
+                if self._play_cached(key, play_audio):
+                    return self._cache_path(key) if save_file else None
+                
                 try:
-                    audio_path = self.cloud.speak_premium(text, save_file=save_file)
-                    if audio_path:
-                        if play_audio:
-                            self._play_audio(audio_path)
-                        return audio_path
+                    # Streams straight to the speaker while it downloads
+                    pcm = self.cloud.speak_premium(
+                        text,
+                        save_file=False,
+                        play_audio=play_audio
+                    )
+                    if pcm:
+                        samples = np.frombuffer(pcm[:len(pcm) // 2 * 2], dtype=np.int16)
+                        self._cache_put(
+                            key,
+                            samples.astype(np.float32) / 32768.0,
+                            Config.ELEVENLABS_SAMPLE_RATE
+                        )
+                        return self._cache_path(key) if save_file else None
                 except Exception as e:
                     print(f"[WARN] ElevenLabs failed, falling back to local: {e}")
             
             # 2. Fallback to Local TTS
-            # Generate audio file path
-            if save_file:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                audio_path = os.path.join(self.audio_dir, f"tts_{timestamp}.wav")
-            else:
-                import tempfile
-                audio_path = tempfile.mktemp(suffix=".wav")
+            key = self._cache_key(text)
+            if self._play_cached(key, play_audio):
+                return self._cache_path(key) if save_file else None
             
-            # Generate speech
-            self.tts.tts_to_file(
-                text=text,
-                file_path=audio_path
-            )
+            # Generate speech straight into the cache
+            audio_path = self._cache_path(key)
+            if self.onnx:
+                data, sample_rate = self._onnx_synth(text)
+                self._cache_put(key, data, sample_rate)
+            else:
+                self.tts.tts_to_file(
+                    text=text,
+                    file_path=audio_path
+                )
+                data, sample_rate = sf.read(audio_path, dtype="float32")
+                self._cache_put(key, data, sample_rate, write=False)
             
             # Play audio
             if play_audio:
-                self._play_audio(audio_path)
+                self._play_array(data, sample_rate)
             
             print(f"[OK] Audio {'saved and played' if play_audio else 'saved'}: {audio_path}")
             
-            # Cleanup old files
-            if save_file:
-                self._cleanup_old_audio()
-            
             return audio_path if save_file else None
             
         except Exception as e:
             print(f"[ERROR] TTS error: {e}")
             return None
     
+    def _cache_key(self, text, premium=False):
+        """Content address for an utterance (engine + voice + text)"""
+        voice = f"elevenlabs|{Config.ELEVENLABS_VOICE_ID}" if premium else self.model_name
+        return hashlib.sha1(f"{voice}|{text}".encode("utf-8")).hexdigest()
+    
+    def _cache_path(self, key):
+        """WAV file backing a cache entry"""
+        return os.path.join(self.cache_dir, f"{key}.wav")
+    
+    def _cache_get(self, key):
+        """Return (samples, sample_rate) for a cached utterance, or None"""
+        with self._cache_lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            entry = self._cache[key]
+        
+        if entry is None:
+            # Known from a previous run - decode once, keep in memory
+            try:
+                entry = sf.read(self._cache_path(key), dtype="float32")
+            except Exception:
+                with self._cache_lock:
+                    self._cache.pop(key, None)
+                return None
+            with self._cache_lock:
+                if key in self._cache and self._cache[key] is None:
+                    self._cache[key] = entry
+                    self._cache_bytes += entry[0].nbytes
+                    self._trim_cache_memory()
+        return entry
+    
+    def _cache_put(self, key, data, sample_rate, write=True):
+        """Store an utterance, evicting the least recently used past the limit"""
+        if write:
+            sf.write(self._cache_path(key), data, sample_rate)
+        
+        with self._cache_lock:
+            old = self._cache.get(key)
+            if old is not None:
+                self._cache_bytes -= old[0].nbytes
+            self._cache[key] = (data, sample_rate)
+            self._cache.move_to_end(key)
+            self._cache_bytes += data.nbytes
+            
+            evicted = []
+            while len(self._cache) > Config.TTS_CACHE_SIZE:
+                old_key, old = self._cache.popitem(last=False)
+                if old is not None:
+                    self._cache_bytes -= old[0].nbytes
+                evicted.append(old_key)
+            self._trim_cache_memory()
+        
+        for old_key in evicted:
+            try:
+                os.remove(self._cache_path(old_key))
+            except OSError:
+                pass
+    
+    def _trim_cache_memory(self):
+        """
+        Drop the oldest decoded clips back to disk-only entries until the
+        cache fits in TTS_CACHE_MEMORY_MB (call with _cache_lock held)
+        """
+        budget = Config.TTS_CACHE_MEMORY_MB * 1024 * 1024
+        # The newest entry always stays decoded
+        for key in list(self._cache)[:-1]:
+            if self._cache_bytes <= budget:
+                break
+            entry = self._cache[key]
+            if entry is not None:
+                self._cache[key] = None
+                self._cache_bytes -= entry[0].nbytes
+    
+    def _cache_put_async(self, key, data, sample_rate):
+        """Store an utterance in memory now and write its WAV in the background"""
+        self._cache_put(key, data, sample_rate, write=False)
+        self._persist_pool.submit(self._cache_persist, key, data, sample_rate)
+    
+    def _cache_persist(self, key, data, sample_rate):
+        """Write a cache entry's WAV unless it was evicted in the meantime"""
+        with self._cache_lock:
+            if key not in self._cache:
+                return
+        try:
+            sf.write(self._cache_path(key), data, sample_rate)
+        except Exception as e:
+            print(f"[WARN] TTS cache write failed: {e}")
+            return
+        
+        # Evicted while writing: don't leave an orphaned file behind
+        with self._cache_lock:
+            evicted = key not in self._cache
+        if evicted:
+            try:
+                os.remove(self._cache_path(key))
+            except OSError:
+                pass
+    
+    def _play_cached(self, key, play_audio):
+        """Play a cached utterance; returns False on a cache miss"""
+        hit = self._cache_get(key)
+        if hit is None:
+            return False
+        
+        print("[TTS] Cache hit")
+        if play_audio:
+            self._play_array(*hit)
+        return True
+    
     def speak_streaming(self, text, chunk_size=50):
         """
-        Speak text in chunks for faster perceived response
-        (Simulated streaming - generates full audio but plays in chunks)
+        Speak text sentence by sentence for faster perceived response
+        (later sentences are synthesized while earlier ones play)
         
         Args:
             text: Text to speak
@@ -132,15 +377,107 @@ class LocalTTS:
         # Split text into sentences for more natural chunking
         sentences = self._split_sentences(text)
         
-        for i, sentence in enumerate(sentences):
+        # The whole text is known: queue every sentence now so synthesis
+        # runs back to back instead of waiting on playback
+        futures = [self._synth_pool.submit(self._synth_to_array, s) for s in sentences]
+        
+        for i, (sentence, future) in enumerate(zip(sentences, futures)):
             print(f"[TTS] [{i+1}/{len(sentences)}] {sentence}")
-            self.speak(sentence, save_file=False, play_audio=True)
+            self._play_clip(future.result())
+    
+    def _play_pipelined(self, sentences):
+        """
+        Play sentences back to back, synthesizing one ahead
+        
+        Args:
+            sentences: Iterable of sentence strings
+        """
+        pending = None
+        for sentence in sentences:
+            future = self._synth_pool.submit(self._synth_to_array, sentence)
+            if pending is not None:
+                self._play_clip(pending.result())
+            pending = future
+        
+        if pending is not None:
+            self._play_clip(pending.result())
+    
+    def _play_clip(self, clip):
+        """Play a (samples, sample_rate) clip with short fades to avoid clicks"""
+        if clip is None:
+            return
+        data, sample_rate = clip
+        self._play_array(self._fade(data, sample_rate), sample_rate)
+    
+    def _fade(self, data, sample_rate, ms=2):
+        """Copy of data with linear fade-in/out at both ends"""
+        n = min(int(sample_rate * ms / 1000), len(data) // 2)
+        data = np.array(data, dtype=np.float32)
+        if n > 0:
+            ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+            data[:n] *= ramp
+            data[-n:] *= ramp[::-1]
+        return data
+    
+    def speak_to_array(self, text):
+        """
+        Synthesize text in memory (no file, no playback)
+        
+        Args:
+            text: Text to synthesize
+            
+        Returns:
+            tuple: (float32 samples, sample_rate), or None on failure
+        """
+        print(f"[TTS] Synthesizing: {text[:50]}...")
+        return self._synth_to_array(text)
+    
+    def _synth_to_array(self, text):
+        """
+        Synthesize text to samples without playing it
+        
+        Args:
+            text: Text to synthesize
+            
+        Returns:
+            tuple: (float32 samples, sample_rate), or None on failure
+        """
+        try:
+            if self.cloud and Config.ELEVENLABS_API_KEY:
+                key = self._cache_key(text, premium=True)
+                hit = self._cache_get(key)
+                if hit is not None:
+                    return hit
+                try:
+                    pcm = self.cloud.speak_premium(text, save_file=False, play_audio=False)
+                    if pcm:
+                        samples = np.frombuffer(pcm[:len(pcm) // 2 * 2], dtype=np.int16)
+                        clip = (samples.astype(np.float32) / 32768.0, Config.ELEVENLABS_SAMPLE_RATE)
+                        self._cache_put_async(key, *clip)
+                        return clip
+                except Exception as e:
+                    print(f"[WARN] ElevenLabs failed, falling back to local: {e}")
+            
+            key = self._cache_key(text)
+            hit = self._cache_get(key)
+            if hit is not None:
+                return hit
+            
+            # Waveform straight from the model, no temp file
+            if self.onnx:
+                clip = self._onnx_synth(text)
+            else:
+                wav = np.asarray(self.tts.tts(text=text), dtype=np.float32)
+                clip = (wav, self.tts.synthesizer.output_sample_rate)
+            self._cache_put_async(key, *clip)
+            return clip
+        except Exception as e:
+            print(f"[ERROR] TTS error: {e}")
+            return None
     
     def _split_sentences(self, text):
         """Split text into sentences"""
-        import re
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+        return [s.strip() for s in _SENT_END_STRIP.split(text) if s.strip()]
     
     def _play_audio(self, audio_path):
         """Play audio file"""
@@ -149,31 +486,70 @@ class LocalTTS:
             data, sample_rate = sf.read(audio_path)
             
             # Play audio
-            sd.play(data, sample_rate)
-            sd.wait()  # Wait until audio finishes
+            self._play_array(data, sample_rate)
             
         except Exception as e:
             print(f"[WARN] Playback error: {e}")
     
-    def _cleanup_old_audio(self):
-        """Delete old audio files, keeping only the most recent ones"""
+    def _play_array(self, data, sample_rate):
+        """Play decoded samples on the persistent output stream"""
         try:
-            # Get all audio files
-            audio_files = []
-            for filename in os.listdir(self.audio_dir):
-                if filename.endswith(('.wav', '.mp3')):
-                    filepath = os.path.join(self.audio_dir, filename)
-                    audio_files.append((filepath, os.path.getmtime(filepath)))
-            
-            # Sort by time (newest first)
-            audio_files.sort(key=lambda x: x[1], reverse=True)
+            data = np.asarray(data, dtype=np.float32)
+            if data.ndim > 1:
+                data = data.mean(axis=1, dtype=np.float32)
             
-            # Delete old files beyond the limit
-            max_files = Config.MAX_AUDIO_FILES
-            if len(audio_files) > max_files:
-                for filepath, _ in audio_files[max_files:]:
-                    os.remove(filepath)
-                    print(f"[CLEANUP] Deleted old audio: {os.path.basename(filepath)}")
+            with self._out_lock:
+                stream = self._out_streams.get(sample_rate)
+                if stream is None:
+                    stream = sd.OutputStream(
+                        samplerate=sample_rate,
+                        channels=1,
+                        dtype="float32",
+                        blocksize=1024,
+                        latency="low"
+                    )
+                    stream.start()
+                    self._out_streams[sample_rate] = stream
+                
+                # Blocks until the samples are queued to the device
+                stream.write(data.reshape(-1, 1))
+        except Exception as e:
+            print(f"[WARN] Playback error: {e}")
+    
+    def close(self):
+        """Stop the output streams and the synth and cache-write workers"""
+        with self._out_lock:
+            for stream in self._out_streams.values():
+                try:
+                    stream.stop()
+                    stream.close()
+                except Exception:
+                    pass
+            self._out_streams.clear()
+        self._synth_pool.shutdown(wait=False)
+        # Let queued cache writes finish so no truncated WAV is left
+        self._persist_pool.shutdown(wait=True)
+    
+    def _cleanup_old_audio(self):
+        """
+        Delete old audio files at startup, keeping only the most recent ones
+        (files saved later are capped where they are written)
+        """
+        try:
+            # One scandir pass (stat comes with the entry); the deque keeps
+            # the newest files and hands back the ones pushed out
+            entries = sorted(
+                (e for e in os.scandir(self.audio_dir)
+                 if e.is_file() and e.name.endswith(('.wav', '.mp3'))),
+                key=lambda e: e.stat().st_mtime
+            )
+            recent = deque(maxlen=Config.MAX_AUDIO_FILES)
+            for entry in entries:
+                if len(recent) == recent.maxlen:
+                    oldest = recent[0]
+                    os.remove(oldest)
+                    print(f"[CLEANUP] Deleted old audio: {os.path.basename(oldest)}")
+                recent.append(entry.path)
         except Exception as e:
             print(f"[WARN] Cleanup error: {e}")
     
@@ -184,32 +560,58 @@ class LocalTTS:
         Args:
             text_stream: Generator yielding text chunks
         """
+        try:
+            self._play_pipelined(self._sentences_from_stream(text_stream))
+        except Exception as e:
+            print(f"[ERROR] Stream TTS error: {e}")
+    
+    def synth_stream(self, text_stream):
+        """
+        Queue synthesis of each sentence as soon as it completes in a text
+        stream (for sending audio elsewhere instead of playing it)
+        
+        Args:
+            text_stream: Generator yielding text chunks
+            
+        Yields:
+            tuple: (sentence, Future resolving to a faded (samples, sample_rate)
+            clip, or None on failure)
+        """
+        for sentence in self._sentences_from_stream(text_stream):
+            yield sentence, self._synth_pool.submit(self._synth_faded, sentence)
+    
+    def _synth_faded(self, text):
+        """Synthesize text with the same edge fades used for local playback"""
+        clip = self._synth_to_array(text)
+        if clip is None:
+            return None
+        data, sample_rate = clip
+        return self._fade(data, sample_rate), sample_rate
+    
+    def _sentences_from_stream(self, text_stream):
+        """Yield complete sentences as soon as they appear in a text stream"""
         sentence_buffer = ""
-        sentence_endings = re.compile(r'[.!?]\s+')
         
-        try:
-            for chunk in text_stream:
-                sentence_buffer += chunk
-                
-                # Check if we have a complete sentence
-                match = sentence_endings.search(sentence_buffer)
-                if match:
-                    # Extract complete sentence
-                    sentence = sentence_buffer[:match.end()].strip()
-                    sentence_buffer = sentence_buffer[match.end():]
-                    
-                    # Speak the sentence immediately
-                    if sentence:
-                        print(f"[STREAM] {sentence}")
-                        self.speak(sentence, save_file=False, play_audio=True)
+        for chunk in text_stream:
+            sentence_buffer += chunk
             
-            # Speak any remaining text
-            if sentence_buffer.strip():
-                print(f"[STREAM] {sentence_buffer}")
-                self.speak(sentence_buffer.strip(), save_file=False, play_audio=True)
+            # Check if we have a complete sentence
+            match = _SENT_END_FIND.search(sentence_buffer)
+            while match:
+                # Extract complete sentence
+                sentence = sentence_buffer[:match.end()].strip()
+                sentence_buffer = sentence_buffer[match.end():]
                 
-        except Exception as e:
-            print(f"[ERROR] Stream TTS error: {e}")
+                if sentence:
+                    print(f"[STREAM] {sentence}")
+                    yield sentence
+                
+                match = _SENT_END_FIND.search(sentence_buffer)
+        
+        # Speak any remaining text
+        if sentence_buffer.strip():
+            print(f"[STREAM] {sentence_buffer}")
+            yield sentence_buffer.strip()
     
     def list_available_models(self):
         """List all available TTS models"""
@@ -1,5 +1,8 @@
 import cv2
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from config import Config
 
@@ -12,8 +15,24 @@ class Vision:
         # Create image directory if it doesn't exist
         os.makedirs(self.image_dir, exist_ok=True)
         
+        # Latest frame slot, filled by the capture thread: (frame, monotonic time)
+        self._latest = None
+        self._lock = threading.Lock()
+        self._new_frame = threading.Event()
+        self._running = False
+        self._grab_thread = None
+        
+        # Image saves happen off the caller's thread
+        self._save_pool = ThreadPoolExecutor(max_workers=1)
+        
         # Initialize camera
         self._init_camera()
+        
+        # Keep reading the camera in the background so callers never wait on it
+        if self.cap is not None and self.cap.isOpened():
+            self._running = True
+            self._grab_thread = threading.Thread(target=self._grab_loop, daemon=True)
+            self._grab_thread.start()
     
     def _init_camera(self):
         """Initialize camera connection"""
@@ -24,10 +43,16 @@ class Vision:
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
             self.cap.set(cv2.CAP_PROP_FPS, 30)
+            # Hold at most one frame in the driver so reads are never stale.
+            # Backends that ignore this (MJPEG/RTSP) still queue frames, but
+            # the capture thread reads nonstop, so the queue never builds up.
+            if not self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+                print("ℹ️ Camera backend ignores buffer size (capture thread drains it)")
             
             # Test capture
-            ret, _ = self.cap.read()
+            ret, frame = self.cap.read()
             if ret:
+                self._latest = (frame, time.monotonic())
                 print("✅ Camera initialized successfully")
             else:
                 print("⚠️ Camera connected but failed to capture")
@@ -36,12 +61,57 @@ class Vision:
             print(f"❌ Camera initialization error: {e}")
             self.cap = None
     
+    def _grab_loop(self):
+        """Capture thread: keep the newest frame in the slot"""
+        while self._running:
+            try:
+                ret, frame = self.cap.read()
+            except Exception as e:
+                print(f"❌ Capture error: {e}")
+                ret = False
+            
+            if not ret:
+                time.sleep(0.01)
+                continue
+            
+            with self._lock:
+                self._latest = (frame, time.monotonic())
+            self._new_frame.set()
+    
+    def read(self):
+        """
+        Latest camera frame (does not wait for the camera)
+        
+        Returns:
+            tuple: (ret, frame) like cv2.VideoCapture.read(); the frame is
+            shared, so copy it before modifying
+        """
+        with self._lock:
+            latest = self._latest
+        if latest is None:
+            return False, None
+        return True, latest[0]
+    
+    def wait_frame(self, timeout=None):
+        """
+        Block until the capture thread stores a new frame
+        
+        Args:
+            timeout: Seconds to wait (None waits forever)
+            
+        Returns:
+            bool: True if a new frame arrived
+        """
+        arrived = self._new_frame.wait(timeout)
+        self._new_frame.clear()
+        return arrived
+    
     def capture_frame(self, save=True):
         """
         Capture a single frame from camera
         
         Args:
-            save (bool): Whether to save the image
+            save (bool): Whether to save the image (written in the background)
             
         Returns:
             str: Path to saved image, or None if error
@@ -51,17 +121,19 @@ class Vision:
             return None
         
         try:
-            ret, frame = self.cap.read()
+            ret, frame = self.read()
             
             if not ret:
                 print("❌ Failed to capture frame")
                 return None
             
+            frame = frame.copy()
+            
             if save:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 image_path = os.path.join(self.image_dir, f"capture_{timestamp}.jpg")
                 
-                cv2.imwrite(image_path, frame)
+                self._save_pool.submit(cv2.imwrite, image_path, frame)
                 print(f"📸 Image saved: {image_path}")
                 
                 return image_path
@@ -103,7 +175,8 @@ class Vision:
         start_time = datetime.now()
         
         while (datetime.now() - start_time).seconds < duration:
-            ret, frame = self.cap.read()
+            self.wait_frame(timeout=1)
+            ret, frame = self.read()
             
             if not ret:
                 break
@@ -117,6 +190,13 @@ class Vision:
     
     def cleanup(self):
         """Release camera resources"""
+        self._running = False
+        if self._grab_thread is not None:
+            self._grab_thread.join(timeout=1)
+        
+        # Finish pending saves
+        self._save_pool.shutdown(wait=True)
+        
         if self.cap is not None:
             self.cap.release()
             print("✅ Camera released")
@@ -10,14 +10,16 @@ import cv2
 import numpy as np
 import json
 import asyncio
-from datetime import datetime
+import re
+from collections import deque
+import time
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent))
 
 from config import Config
-from modules.hybrid_brain import HybridBrain
+from modules.hybrid_brain import HybridBrain, VISION_FAILED
 from modules.local_stt import LocalSTT
 from modules.local_tts import LocalTTS
 
@@ -39,6 +41,15 @@ tts = LocalTTS()
 latest_frame = None
 latest_vision = None
 audio_buffer = []
+_vision_task = None  # At most one frame analysis in flight
+_last_phash = None  # dHash of the last analyzed frame
+PHASH_MAX_DISTANCE = 4  # Bits that may differ for "same scene"
+
+# Questions about what the robot sees
+_VISION_RE = re.compile(r"\b(?:see|look|what|view|show)\b", re.IGNORECASE)
+
+# Speech gate: RMS > 0.02 full scale, compared as mean square of raw int16
+SPEECH_ENERGY = (0.02 * 32767.0) ** 2
 
 print("✅ Server initialized\n")
 
@@ -57,57 +68,192 @@ async def receive_frame(request: Request):
     Args:
         request: Raw JPEG image bytes in request body
     """
-    global latest_frame, latest_vision
+    global latest_frame, _vision_task, _last_phash
     
     try:
         # Read raw bytes from request body
         data = await request.body()
         
-        # Decode JPEG
-        nparr = np.frombuffer(data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Validate from the JPEG header; nothing here needs pixels, the
+        # vision models take the JPEG bytes as-is
+        shape = _jpeg_shape(data)
         
-        if frame is None:
+        if shape is None:
             return JSONResponse({"error": "Invalid image"}, status_code=400)
         
-        latest_frame = frame
+        latest_frame = data
         
-        # Analyze with vision model (async, don't block)
-        try:
-            # Save temp file
-            temp_path = f"{Config.IMAGE_DIR}/pi_frame_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-            cv2.imwrite(temp_path, frame)
-            
-            # Analyze
-            analysis = brain.analyze_image(temp_path, "Briefly describe what you see.")
-            latest_vision = {
-                "text": analysis,
-                "timestamp": datetime.now()
-            }
-            print(f"👁️ Vision: {analysis[:60]}...")
+        # Analyze with vision model off the event loop; frames arriving
+        # while an analysis is running are dropped, not queued
+        accepted = _vision_task is None or _vision_task.done()
+        if accepted:
+            # Scene unchanged since the last analysis: keep that description
+            phash = _dhash(data)
+            if (phash is not None and _last_phash is not None and latest_vision
+                    and bin(phash ^ _last_phash).count("1") <= PHASH_MAX_DISTANCE):
+                latest_vision["timestamp"] = time.monotonic()
+                return {"status": "ok", "shape": shape, "need_frame": True, "cached": True}
             
-        except Exception as e:
-            print(f"⚠️ Vision error: {e}")
+            # The hash becomes the reference only once this analysis succeeds
+            _vision_task = asyncio.get_running_loop().run_in_executor(
+                None, _analyze_frame, data, phash
+            )
         
-        return {"status": "ok", "shape": frame.shape}
+        # need_frame tells the Pi whether this frame was used, so it can
+        # slow down while analysis is busy
+        return {"status": "ok", "shape": shape, "need_frame": accepted}
     
     except Exception as e:
         print(f"❌ Frame error: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+def _jpeg_shape(data):
+    """
+    Read (height, width, channels) from a JPEG's SOF header
+    
+    Args:
+        data: JPEG bytes
+        
+    Returns:
+        tuple: Frame shape, or None if this is not a readable JPEG
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        # Standalone markers carry no length field
+        if marker == 0xFF or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = int.from_bytes(data[i + 2:i + 4], "big")
+        # SOF0-SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return (height, width, data[i + 9])
+        i += 2 + length
+    
+    return None
+
+
+def _dhash(jpeg_bytes):
+    """
+    64-bit difference hash of a JPEG frame
+    
+    Decodes at 1/8 scale in grayscale (libjpeg skips most of the IDCT),
+    shrinks to 9x8 and compares horizontal neighbours.
+    
+    Returns:
+        int: Hash, or None if the image can't be decoded
+    """
+    small = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        return None
+    g = cv2.resize(small, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(g[:, 1:] > g[:, :-1]).tobytes(), "big")
+
+
+def _analyze_frame(jpeg_bytes, phash=None):
+    """
+    Describe a Pi frame straight from its JPEG bytes (runs in a worker thread)
+    
+    Args:
+        jpeg_bytes: Frame as sent by the Pi
+        phash: dHash of the frame; remembered only if the analysis succeeds,
+               so a failed frame never suppresses later look-alikes
+    """
+    global latest_vision, _last_phash
+    
+    try:
+        analysis = brain.analyze_image_bytes(jpeg_bytes, "Briefly describe what you see.")
+        if not analysis or analysis == VISION_FAILED:
+            print("⚠️ Vision analysis failed")
+            return
+        
+        _last_phash = phash
+        latest_vision = {
+            "text": analysis,
+            "timestamp": time.monotonic()
+        }
+        print(f"👁️ Vision: {analysis[:60]}...")
+        
+    except Exception as e:
+        print(f"⚠️ Vision error: {e}")
+
+
+async def _stream_response(websocket, text):
+    """
+    Stream the brain's reply to the Pi one sentence at a time
+    
+    The LLM stream is read on a worker thread; each finished sentence goes
+    to the TTS pool right away, so later sentences are generated and
+    synthesized while the Pi plays earlier ones.
+    
+    Args:
+        websocket: Pi connection
+        text: User message (with any vision context)
+        
+    Returns:
+        str: Full response text
+    """
+    loop = asyncio.get_running_loop()
+    sentences = asyncio.Queue()
+    
+    def produce():
+        try:
+            for item in tts.synth_stream(brain.chat_stream(text)):
+                loop.call_soon_threadsafe(sentences.put_nowait, item)
+        finally:
+            loop.call_soon_threadsafe(sentences.put_nowait, None)
+    
+    producer = loop.run_in_executor(None, produce)
+    response = []
+    
+    while True:
+        item = await sentences.get()
+        if item is None:
+            break
+        
+        sentence, future = item
+        response.append(sentence)
+        await websocket.send_text(json.dumps({
+            "type": "text",
+            "text": sentence
+        }))
+        
+        clip = await asyncio.wrap_future(future)
+        if clip is not None:
+            audio_data, sr = clip
+            # One binary frame per sentence:
+            # b"A" + samplerate (uint32 LE) + float32 samples
+            await websocket.send_bytes(
+                b"A" + int(sr).to_bytes(4, "little")
+                + audio_data.astype(np.float32, copy=False).tobytes()
+            )
+    
+    await producer
+    return " ".join(response)
+
+
 @app.websocket("/audio/stream")
 async def audio_stream(websocket: WebSocket):
     """
     WebSocket for bidirectional audio streaming
     
     Pi → PC: Audio chunks for transcription
-    PC → Pi: TTS audio responses
+    PC → Pi: TTS audio responses (binary: b"A" + uint32 LE samplerate +
+             float32 samples) and text responses (JSON)
     """
     await websocket.accept()
     print("🔌 Pi connected via WebSocket")
     
-    audio_buffer = []
+    # Cap one utterance at 30s of 0.25s chunks (oldest audio drops first)
+    audio_buffer = deque(maxlen=120)
     silence_count = 0
     silence_threshold = 8  # 2 seconds of silence
     
@@ -116,14 +262,16 @@ async def audio_stream(websocket: WebSocket):
             # Receive audio from Pi
             data = await websocket.receive_bytes()
             
-            # Convert bytes to numpy array
-            audio_chunk = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
+            # View bytes as int16 (no copy); convert only once speech ends
+            audio_chunk = np.frombuffer(data, dtype=np.int16)
+            if audio_chunk.size == 0:
+                continue
             
-            # Calculate volume
-            volume = np.sqrt(np.mean(audio_chunk**2))
+            # Mean square in one int64 pass, no float conversion
+            energy = np.einsum("i,i->", audio_chunk, audio_chunk, dtype=np.int64) / audio_chunk.size
             
             # Speech detection
-            if volume > 0.02:  # Speech detected
+            if energy > SPEECH_ENERGY:  # Speech detected
                 audio_buffer.append(audio_chunk)
                 silence_count = 0
             elif len(audio_buffer) > 0:  # In speech, but silent chunk
@@ -134,93 +282,42 @@ async def audio_stream(websocket: WebSocket):
                 if silence_count >= silence_threshold:
                     print("🔄 Processing speech...")
                     
-                    # Concatenate audio
-                    full_audio = np.concatenate(audio_buffer)
+                    # Concatenate and scale to float32 in one pass each
+                    full_audio = np.multiply(
+                        np.concatenate(audio_buffer),
+                        np.float32(1 / 32767.0),
+                        dtype=np.float32
+                    )
                     
-                    # Transcribe with Whisper
+                    # Transcribe with Whisper (in memory, no temp WAV)
                     try:
-                        import tempfile
-                        import wave
-                        import os
-                        
-                        # Create temp file
-                        tmp_fd, tmp_path = tempfile.mkstemp(suffix=".wav")
-                        
-                        try:
-                            # Write WAV file
-                            with wave.open(tmp_path, 'wb') as wav:
-                                wav.setnchannels(1)
-                                wav.setsampwidth(2)
-                                wav.setframerate(16000)
-                                audio_int16 = (full_audio * 32767).astype(np.int16)
-                                wav.writeframes(audio_int16.tobytes())
-                            
-                            # Close the file descriptor
-                            os.close(tmp_fd)
-                            
-                            # Now transcribe (file is fully closed)
-                            text = stt.transcribe_file(tmp_path)
-                        
-                        finally:
-                            # Cleanup temp file
-                            if os.path.exists(tmp_path):
-                                os.unlink(tmp_path)
+                        text = stt.transcribe_array(full_audio, sample_rate=16000)
                         
                         if text:
                             print(f"👤 User: {text}")
                             
                             # Generate response with vision context if available
-                            image_path = None
                             if latest_vision:
-                                age = (datetime.now() - latest_vision['timestamp']).total_seconds()
+                                age = time.monotonic() - latest_vision['timestamp']
                                 if age < 30:  # Use vision if recent
                                     # Check if user asks about vision
-                                    vision_keywords = ['see', 'look', 'what', 'view', 'show']
-                                    if any(kw in text.lower() for kw in vision_keywords):
+                                    if _VISION_RE.search(text):
                                         # Inject vision context
                                         text = f"[SYSTEM: You see: {latest_vision['text']}]\n\nUser: {text}"
                             
-                            # Stream response
-                            response_text = ""
-                            for chunk in brain.chat_stream(text):
-                                response_text += chunk
-                            
-                            print(f"🤖 Ava: {response_text}")
-                            
-                            # Send text response
-                            await websocket.send_text(json.dumps({
-                                "type": "text",
-                                "text": response_text
-                            }))
-                            
-                            # Generate TTS
+                            # Stream response, sending each sentence's audio
+                            # as soon as it is synthesized
                             try:
-                                audio_path = tts.speak(response_text, save_file=False, play_audio=False)
-                                
-                                if audio_path:
-                                    # Read audio file
-                                    import soundfile as sf
-                                    audio_data, sr = sf.read(audio_path)
-                                    
-                                    # Send audio to Pi
-                                    await websocket.send_text(json.dumps({
-                                        "type": "audio",
-                                        "data": audio_data.tobytes().hex(),
-                                        "samplerate": sr
-                                    }))
-                                    
-                                    # Cleanup
-                                    import os
-                                    os.unlink(audio_path)
-                            
+                                response_text = await _stream_response(websocket, text)
+                                print(f"🤖 Ava: {response_text}")
                             except Exception as e:
-                                print(f"⚠️ TTS error: {e}")
+                                print(f"⚠️ Response error: {e}")
                     
                     except Exception as e:
                         print(f"❌ Transcription error: {e}")
                     
                     # Reset buffer
-                    audio_buffer = []
+                    audio_buffer.clear()
                     silence_count = 0
     
     except WebSocketDisconnect:
@@ -7,6 +7,7 @@ import cv2
 import sounddevice as sd
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import websocket
 import threading
 import time
@@ -27,28 +28,72 @@ class PiClient:
         self.server_url = server_url
         self.ws_url = server_url.replace("http://", "ws://").replace("https://", "wss://")
         
+        # One keep-alive connection for all frame uploads
+        self.frame_url = f"{server_url}/video/frame"
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "image/jpeg"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
         # Camera setup
         print("📷 Initializing camera...")
         self.camera = cv2.VideoCapture(0)
+        # Ask the camera for MJPG so frames arrive already compressed
+        self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         self.camera.set(cv2.CAP_PROP_FPS, 30)
         
         if not self.camera.isOpened():
             raise RuntimeError("❌ Failed to open camera")
-        print("✅ Camera ready")
+        
+        self.mjpeg_passthrough = self._enable_mjpeg_passthrough()
+        mode = "MJPG passthrough" if self.mjpeg_passthrough else "re-encoding"
+        print(f"✅ Camera ready ({mode})")
         
         # Audio setup
         print("🎤 Initializing audio...")
         self.sample_rate = 16000
         self.channels = 1
         self.chunk_size = 4000  # 0.25s chunks
+        # Speaker stream stays open between responses (reopened if the rate changes)
+        self.out_stream = None
         print("✅ Audio ready")
         
+        # Frame pacing: up to 5 FPS, slower while the server is busy analyzing
+        self.frame_interval = 0.2
+        self.busy_interval = 0.5
+        
         # State
         self.running = False
         self.ws = None
         
+    def _enable_mjpeg_passthrough(self):
+        """
+        Try to get the camera's JPEG frames without decoding them
+        
+        With V4L2 + MJPG, turning off RGB conversion makes read() return
+        the compressed frame as a flat byte array that can be sent as-is.
+        
+        Returns:
+            bool: True if frames come back as raw JPEG
+        """
+        try:
+            if not self.camera.set(cv2.CAP_PROP_CONVERT_RGB, 0):
+                return False
+            ret, frame = self.camera.read()
+            if ret and frame is not None and frame.dtype == np.uint8 \
+                    and (frame.ndim == 1 or frame.shape[0] == 1) \
+                    and frame.ravel()[:2].tobytes() == b'\xff\xd8':
+                return True
+        except Exception:
+            pass
+        
+        # Not supported by this backend - back to decoded BGR frames
+        self.camera.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+        return False
+    
     def connect_websocket(self):
         """Connect to PC WebSocket for audio streaming"""
         max_retries = 5
@@ -75,6 +120,7 @@ class PiClient:
         
         while self.running:
             try:
+                start = time.perf_counter()
                 ret, frame = self.camera.read()
                 
                 if not ret:
@@ -82,22 +128,34 @@ class PiClient:
                     time.sleep(0.1)
                     continue
                 
-                # Encode as JPEG (compress for network)
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+                if self.mjpeg_passthrough:
+                    # Already a JPEG straight from the camera
+                    payload = frame.tobytes()
+                else:
+                    # Encode as JPEG (compress for network)
+                    _, buffer = cv2.imencode('.jpg', frame, [
+                        cv2.IMWRITE_JPEG_QUALITY, 60,
+                        cv2.IMWRITE_JPEG_OPTIMIZE, 1
+                    ])
+                    payload = buffer.tobytes()
                 
                 # Send to PC
-                response = requests.post(
-                    f"{self.server_url}/video/frame",
-                    data=buffer.tobytes(),
+                response = self.session.post(
+                    self.frame_url,
+                    data=payload,
                     timeout=1
                 )
                 
                 frame_count += 1
-                if frame_count % 25 == 0:  # Every 5 seconds
+                if frame_count % 25 == 0:
                     print(f"📹 Sent {frame_count} frames")
                 
-                # 5 FPS (save bandwidth)
-                time.sleep(0.2)
+                # Frame was dropped server-side: back off until it catches up
+                need_frame = response.ok and response.json().get("need_frame", True)
+                interval = self.frame_interval if need_frame else self.busy_interval
+                
+                # Capture + upload time counts toward the interval
+                time.sleep(max(0.0, interval - (time.perf_counter() - start)))
                 
             except requests.exceptions.Timeout:
                 print("⚠️ Video upload timeout")
@@ -117,9 +175,8 @@ class PiClient:
             try:
                 # Send audio to PC (only if socket is open)
                 if self.ws and self.running:
-                    # Convert float32 to int16 for smaller size
-                    audio_int16 = (indata * 32767).astype(np.int16)
-                    self.ws.send_binary(audio_int16.tobytes())
+                    # Captured as int16 already - send the raw bytes
+                    self.ws.send_binary(indata.tobytes())
             except (OSError, BrokenPipeError):
                 # Socket closed, silently ignore
                 pass
@@ -132,7 +189,7 @@ class PiClient:
         with sd.InputStream(
             samplerate=self.sample_rate,
             channels=self.channels,
-            dtype=np.float32,
+            dtype=np.int16,
             blocksize=self.chunk_size,
             callback=audio_callback
         ):
@@ -145,21 +202,18 @@ class PiClient:
                         # Receive audio from PC
                         message = self.ws.recv()
                         
-                        if message:
+                        if isinstance(message, bytes) and message[:1] == b'A':
+                            # Binary audio frame: b"A" + samplerate + float32 samples
+                            samplerate = int.from_bytes(message[1:5], "little")
+                            audio_data = np.frombuffer(message, dtype=np.float32, offset=5)
+                            print(f"🔊 Playing response ({len(audio_data)} samples)")
+                            self.play_audio(audio_data, samplerate)
+                        
+                        elif message:
                             # Parse message
                             data = json.loads(message)
                             
-                            if data.get('type') == 'audio':
-                                # Play audio response
-                                audio_data = np.frombuffer(
-                                    bytes.fromhex(data['data']),
-                                    dtype=np.float32
-                                )
-                                print(f"🔊 Playing response ({len(audio_data)} samples)")
-                                sd.play(audio_data, samplerate=data.get('samplerate', 22050))
-                                sd.wait()
-                            
-                            elif data.get('type') == 'text':
+                            if data.get('type') == 'text':
                                 # Display transcription
                                 print(f"💬 Ava: {data['text']}")
                 
@@ -169,6 +223,26 @@ class PiClient:
                     print(f"❌ Audio receive error: {e}")
                     time.sleep(1)
     
+    def play_audio(self, audio_data, samplerate):
+        """
+        Play samples on the long-lived output stream (blocks until written)
+        
+        Args:
+            audio_data: float32 mono samples (a view of the received frame)
+            samplerate: Sample rate of the samples
+        """
+        if self.out_stream is None or self.out_stream.samplerate != samplerate:
+            if self.out_stream is not None:
+                self.out_stream.close()
+            self.out_stream = sd.OutputStream(
+                samplerate=samplerate,
+                channels=1,
+                dtype=np.float32
+            )
+            self.out_stream.start()
+        
+        self.out_stream.write(audio_data)
+    
     def start(self):
         """Start all streaming threads"""
         print("\n" + "="*60)
@@ -202,6 +276,11 @@ class PiClient:
         if self.ws:
             self.ws.close()
         
+        self.session.close()
+        
+        if self.out_stream is not None:
+            self.out_stream.close()
+        
         if self.camera:
             self.camera.release()
         
@@ -3,11 +3,12 @@ Syca v2 - Main Robot Orchestrator
 Hybrid local/cloud AI robot with vision, voice, and conversation
 """
 
+import queue
+import re
 import threading
 import time
-import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import cv2
 import sys
 from pathlib import Path
 
@@ -19,39 +20,73 @@ from modules.continuous_voice import ContinuousVoiceInput
 from modules.local_tts import LocalTTS
 from modules.vision import Vision
 
-# ============================================
-# INITIALIZE ALL SYSTEMS
-# ============================================
-
-print("\n" + "🤖"*30)
-print(f"  {Config.ROBOT_NAME} v2 - Hybrid AI Robot")
-print("🤖"*30 + "\n")
-
-Config.validate()
-
 # Global state
 class RobotState:
     def __init__(self):
         self.current_frame = None
         self.latest_vision_analysis = None
-        self.vision_timestamp = None
+        self.vision_timestamp = None  # time.monotonic() of the analyzed frame
         self.is_speaking = False
-        self.conversation_active = True
+        self.shutdown_event = threading.Event()  # Set once to stop everything
         self.last_interaction = None
         self.processing_speech = False
+        self.vision_future = None  # Analysis in flight, if any
 
 state = RobotState()
 
-# Initialize components
-brain = HybridBrain()
-vision = Vision()
-voice_input = ContinuousVoiceInput(robot_state=state)
-voice_output = LocalTTS()
+# Keyword checks (one pass over the utterance, case-insensitive)
+_EXIT_RE = re.compile(r"\b(?:exit|goodbye|shutdown|stop|quit)\b", re.IGNORECASE)
+_VISION_RE = re.compile(r"\b(?:see|look|view|front|camera|what|holding|show)\b", re.IGNORECASE)
+
+# Components (created by init_systems)
+brain = None
+vision = None
+voice_input = None
+voice_output = None
+
+# Utterances for the speech worker (None stops it)
+speech_queue = queue.SimpleQueue()
+
+# Vision analysis runs here, one frame at a time
+vision_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision")
 
-# Vision queue
-vision_queue = queue.Queue(maxsize=1)
+# ============================================
+# INITIALIZE ALL SYSTEMS
+# ============================================
 
-print(f"✅ {Config.ROBOT_NAME} System Initialized!\n")
+def init_systems():
+    """
+    Initialize all components
+    
+    Kept out of module scope so worker processes (e.g. the STT worker)
+    can import this module without re-initializing the robot.
+    """
+    global brain, vision, voice_input, voice_output
+    
+    print("\n" + "🤖"*30)
+    print(f"  {Config.ROBOT_NAME} v2 - Hybrid AI Robot")
+    print("🤖"*30 + "\n")
+    
+    Config.validate()
+    
+    # Independent components load side by side (models, camera, mic);
+    # the interrupt hook looks brain up when it fires
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        fut_brain = executor.submit(HybridBrain)
+        fut_vision = executor.submit(Vision)
+        fut_voice_input = executor.submit(
+            ContinuousVoiceInput,
+            robot_state=state,
+            on_interrupt=lambda: brain.cancel_stream()
+        )
+        fut_voice_output = executor.submit(LocalTTS)
+        
+        brain = fut_brain.result()
+        vision = fut_vision.result()
+        voice_input = fut_voice_input.result()
+        voice_output = fut_voice_output.result()
+    
+    print(f"✅ {Config.ROBOT_NAME} System Initialized!\n")
 
 # ============================================
 # VISION THREADS
@@ -64,56 +99,67 @@ def fast_vision_loop():
     analysis_interval = Config.VISION_ANALYSIS_INTERVAL
     last_analysis_time = 0
     
-    while state.conversation_active:
+    while not state.shutdown_event.is_set():
         try:
-            ret, frame = vision.cap.read()
+            # Paced by the camera: wake as each new frame lands
+            if not vision.wait_frame(timeout=1):
+                continue
+            
+            ret, frame = vision.read()
             
             if ret:
                 state.current_frame = frame
                 
-                current_time = time.time()
+                current_time = time.monotonic()
                 if current_time - last_analysis_time >= analysis_interval:
-                    # Only queue if previous analysis is done
-                    if vision_queue.empty():
-                        temp_path = f"{Config.IMAGE_DIR}/temp_vision.jpg"
-                        cv2.imwrite(temp_path, frame)
-                        vision_queue.put((temp_path, current_time))
+                    # The frame is handed over in memory (the capture thread
+                    # never reuses it); retried next frame if analysis is busy
+                    if submit_vision_analysis(frame, current_time):
                         last_analysis_time = current_time
             
-            time.sleep(0.05)
-            
         except Exception as e:
             print(f"❌ Vision error: {e}")
             time.sleep(1)
 
-def vision_analyzer_thread():
-    """Background vision analysis"""
-    print("🧠 Vision analyzer started...")
+def submit_vision_analysis(frame, timestamp):
+    """
+    Start analyzing a frame in the background
     
-    while state.conversation_active:
-        try:
-            # Get from queue (non-blocking with timeout)
-            temp_path, timestamp = vision_queue.get(timeout=2)
-            
-            # Analyze with hybrid brain
-            try:
-                analysis = brain.analyze_image(
-                    temp_path,
-                    "Briefly describe what you see in one sentence."
-                )
-                
-                if analysis:
-                    state.latest_vision_analysis = analysis
-                    state.vision_timestamp = datetime.fromtimestamp(timestamp)
-                    print(f"👁️ Vision: {analysis[:60]}...")
-                
-            except Exception as e:
-                print(f"⚠️ Vision analysis error: {e}")
-            
-        except queue.Empty:
-            continue
-        except Exception as e:
-            print(f"❌ Vision analyzer error: {e}")
+    Backpressure: while an analysis is in flight, new frames are refused
+    rather than queued, so a slow model never works through stale frames.
+    
+    Args:
+        frame: BGR frame
+        timestamp: When the frame was captured (time.monotonic())
+        
+    Returns:
+        bool: True if the analysis was started
+    """
+    in_flight = state.vision_future
+    if in_flight is not None and not in_flight.done():
+        return False
+    
+    future = vision_pool.submit(
+        brain.analyze_image_array,
+        frame,
+        "Briefly describe what you see in one sentence."
+    )
+    future.add_done_callback(lambda f: _on_vision_done(f, timestamp))
+    state.vision_future = future
+    return True
+
+def _on_vision_done(future, timestamp):
+    """Store a finished analysis (runs on the vision worker)"""
+    try:
+        analysis = future.result()
+    except Exception as e:
+        print(f"⚠️ Vision analysis error: {e}")
+        return
+    
+    if analysis:
+        state.latest_vision_analysis = analysis
+        state.vision_timestamp = timestamp
+        print(f"👁️ Vision: {analysis[:60]}...")
 
 # ============================================
 # VOICE INTERACTION
@@ -129,12 +175,16 @@ def handle_user_speech(user_text):
     
     state.processing_speech = True
     
-    # Process in separate thread
-    threading.Thread(
-        target=_process_and_respond,
-        args=(user_text,),
-        daemon=True
-    ).start()
+    # Hand off to the speech worker
+    speech_queue.put(user_text)
+
+def speech_worker():
+    """Long-lived worker that answers utterances one at a time"""
+    while True:
+        user_text = speech_queue.get()
+        if user_text is None:
+            break
+        _process_and_respond(user_text)
 
 def _process_and_respond(user_text):
     """Process user input and respond"""
@@ -142,33 +192,28 @@ def _process_and_respond(user_text):
         print(f"\n👤 You: {user_text}")
         
         # Check for exit commands
-        exit_words = ["exit", "goodbye", "shutdown", "stop", "quit"]
-        if any(word in user_text.lower() for word in exit_words):
+        if _EXIT_RE.search(user_text):
             response = "Goodbye! Shutting down."
             voice_output.speak(response)
-            state.conversation_active = False
+            state.shutdown_event.set()
             return
         
         # Get vision context if needed
-        vision_keywords = ['see', 'look', 'view', 'front', 'camera', 'what', 'holding', 'show']
-        asks_about_vision = any(kw in user_text.lower() for kw in vision_keywords)
-        
-        image_path = None
-        if asks_about_vision and state.latest_vision_analysis:
-            if state.vision_timestamp:
-                age = (datetime.now() - state.vision_timestamp).total_seconds()
-                if age < 30:  # Use vision if less than 30s old
-                    image_path = state.current_frame
+        asks_about_vision, vision_context = _resolve_vision_context(user_text)
         
         # Stream response and speak in real-time
         state.is_speaking = True
         try:
-            text_stream = brain.chat_stream(user_text, use_vision_context=asks_about_vision, image_path=image_path)
+            text_stream = brain.chat_stream(
+                user_text,
+                use_vision_context=asks_about_vision,
+                vision_context=vision_context
+            )
             voice_output.speak_stream(text_stream)
         except Exception as e:
             print(f"[ERROR] Streaming error: {e}")
             # Fallback to non-streaming
-            response = generate_response(user_text)
+            response = generate_response(user_text, vision_context)
             print(f"🤖 {Config.ROBOT_NAME}: {response}")
             voice_output.speak(response, save_file=True, play_audio=True)
         
@@ -180,25 +225,48 @@ def _process_and_respond(user_text):
     finally:
         state.processing_speech = False
 
-def generate_response(user_text):
-    """Generate AI response with vision context if needed"""
+def _resolve_vision_context(user_text):
+    """
+    Decide whether a question is about what the robot sees
     
-    # Check if user is asking about vision
-    vision_keywords = ['see', 'look', 'view', 'front', 'camera', 'what', 'holding', 'show']
-    asks_about_vision = any(kw in user_text.lower() for kw in vision_keywords)
+    Args:
+        user_text: What the user said
+        
+    Returns:
+        tuple: (asks_about_vision, recent vision description or None)
+    """
+    if not _VISION_RE.search(user_text):
+        return False, None
     
-    # Use vision context if available and relevant
-    if asks_about_vision and state.latest_vision_analysis:
-        # Check if vision is recent (within cache time)
-        if state.vision_timestamp:
-            age = (datetime.now() - state.vision_timestamp).total_seconds()
-            if age <= Config.VISION_CACHE_SECONDS:
-                enhanced_message = f"""[Current vision: {state.latest_vision_analysis}]
+    # Fresh: use as is. Stale: use it, but analyze the current frame now
+    # instead of waiting for the next interval. Older: don't use it.
+    if state.latest_vision_analysis and state.vision_timestamp is not None:
+        age = time.monotonic() - state.vision_timestamp
+        if age <= Config.VISION_CACHE_SECONDS:
+            return True, state.latest_vision_analysis
+        if age <= Config.VISION_CACHE_SECONDS + Config.VISION_SWR_SECONDS:
+            _request_vision_refresh()
+            return True, state.latest_vision_analysis
+    
+    _request_vision_refresh()
+    return True, None
+
+def _request_vision_refresh():
+    """Analyze the current frame right away (no-op if one is in flight)"""
+    frame = state.current_frame
+    if frame is not None:
+        submit_vision_analysis(frame, time.monotonic())
+
+def generate_response(user_text, vision_context=None):
+    """Generate AI response, grounded in vision context if given"""
+    
+    if vision_context:
+        enhanced_message = f"""[Current vision: {vision_context}]
 
 User question: {user_text}
 
 Respond naturally based on what you can see."""
-                return brain.chat(enhanced_message)
+        return brain.chat(enhanced_message)
     
     # Regular chat
     return brain.chat(user_text)
@@ -219,10 +287,8 @@ def start_robot():
     vision_capture_thread.start()
     print("✅ Vision: Capturing")
     
-    # Thread 2: Vision analyzer
-    vision_analyze_thread = threading.Thread(target=vision_analyzer_thread, daemon=True)
-    vision_analyze_thread.start()
-    print("✅ Vision: Analyzer started")
+    # Thread 2: Speech responses
+    threading.Thread(target=speech_worker, daemon=True).start()
     
     time.sleep(1)
     
@@ -240,16 +306,22 @@ def start_robot():
     # Keep main thread alive
     print("💬 Conversation started... Say 'exit' to stop\n")
     
+    # Wakes the moment anything sets the event; the timeout only keeps
+    # Ctrl+C deliverable on Windows, where an untimed wait blocks it
     try:
-        while state.conversation_active:
-            time.sleep(1)
+        while not state.shutdown_event.wait(timeout=1):
+            pass
     except KeyboardInterrupt:
         print("\n👋 Shutting down...")
     
     # Cleanup
-    state.conversation_active = False
+    state.shutdown_event.set()
     voice_input.stop_listening()
+    speech_queue.put(None)
     vision.cleanup()
+    vision_pool.shutdown(wait=False)
+    brain.close()
+    voice_output.close()
     
     # Show stats
     print("\n")
@@ -259,10 +331,11 @@ def start_robot():
 
 if __name__ == "__main__":
     try:
+        init_systems()
         start_robot()
     except KeyboardInterrupt:
         print("\n👋 Interrupted")
-        state.conversation_active = False
+        state.shutdown_event.set()
     except Exception as e:
         print(f"\n❌ Fatal error: {e}")
         import traceback
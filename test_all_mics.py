@@ -4,7 +4,8 @@ Test all available microphones to find which one works
 
 import sounddevice as sd
 import numpy as np
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 print("\n" + "="*60)
 print("  Testing All Microphones")
@@ -16,43 +17,91 @@ input_devices = [(i, dev) for i, dev in enumerate(devices) if dev['max_input_cha
 
 print(f"Found {len(input_devices)} input devices\n")
 
-for device_id, device in input_devices:
-    print(f"\nTesting Device {device_id}: {device['name']}")
-    print("-" * 60)
+duration = 2
+
+
+def record_and_analyze(device_id, device, audio):
+    """
+    Record from one device and describe the result
+    
+    Args:
+        device_id: sounddevice device index
+        device: Device info from query_devices()
+        audio: float32 buffer for this device's recording (duration * rate)
+        
+    Returns:
+        str: Report for this device
+    """
+    lines = [f"\nTesting Device {device_id}: {device['name']}", "-" * 60]
     
     try:
-        # Record 2 seconds
-        duration = 2
+        # Record 2 seconds. Each device gets its own stream: sd.rec()
+        # shares one global stream and would stop the other recordings.
         sample_rate = int(device['default_samplerate'])
+        filled = [0]
+        done = threading.Event()
         
-        print(f"Recording for {duration} seconds... SPEAK NOW!")
+        def callback(indata, frames, time_info, status):
+            n = min(frames, audio.size - filled[0])
+            audio[filled[0]:filled[0] + n] = indata[:n, 0]
+            filled[0] += n
+            if filled[0] >= audio.size:
+                raise sd.CallbackStop
         
-        audio = sd.rec(
-            int(duration * sample_rate),
+        with sd.InputStream(
             samplerate=sample_rate,
             channels=1,
             dtype=np.float32,
-            device=device_id
-        )
-        sd.wait()
+            device=device_id,
+            callback=callback,
+            finished_callback=done.set
+        ):
+            done.wait(duration + 5)
+        audio = audio[:filled[0]]
         
-        # Analyze
-        volume = np.abs(audio).mean()
-        max_vol = np.abs(audio).max()
+        # Analyze (one |audio| pass, reused for mean and max)
+        np.abs(audio, out=audio)
+        volume = audio.mean()
+        max_vol = audio.max()
         
-        print(f"Average volume: {volume:.6f}")
-        print(f"Max volume: {max_vol:.6f}")
+        lines.append(f"Average volume: {volume:.6f}")
+        lines.append(f"Max volume: {max_vol:.6f}")
         
         if volume > 0.01:
-            print("[OK] This microphone is WORKING!")
-            print(f">>> USE DEVICE {device_id} <<<")
+            lines.append("[OK] This microphone is WORKING!")
+            lines.append(f">>> USE DEVICE {device_id} <<<")
         elif volume > 0.001:
-            print("[WARN] Low volume - might work with boost")
+            lines.append("[WARN] Low volume - might work with boost")
         else:
-            print("[FAIL] No audio detected")
+            lines.append("[FAIL] No audio detected")
             
     except Exception as e:
-        print(f"[ERROR] Failed to test: {e}")
+        lines.append(f"[ERROR] Failed to test: {e}")
+    
+    return "\n".join(lines)
+
+
+if input_devices:
+    # Devices record independently, so test them all at once
+    print(f"Recording from all devices for {duration} seconds... SPEAK NOW!")
+    
+    # One allocation for every recording; each device fills its own slice
+    sizes = [int(duration * dev['default_samplerate']) for _, dev in input_devices]
+    capture_buffer = np.empty(sum(sizes), dtype=np.float32)
+    offsets = np.cumsum([0] + sizes)
+    
+    with ThreadPoolExecutor(max_workers=len(input_devices)) as executor:
+        futures = [
+            executor.submit(
+                record_and_analyze,
+                device_id,
+                device,
+                capture_buffer[offsets[i]:offsets[i + 1]]
+            )
+            for i, (device_id, device) in enumerate(input_devices)
+        ]
+        for future in as_completed(futures):
+            print(future.result())
 
 print("\n" + "="*60)
 print("Test complete!")
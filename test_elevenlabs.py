@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
 from dotenv import load_dotenv
 
@@ -10,10 +11,14 @@ VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
 print(f"Testing API Key: {API_KEY[:5]}...{API_KEY[-5:] if API_KEY else 'None'}")
 
 url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
-headers = {
+
+# Same pooled keep-alive session setup the app uses for ElevenLabs
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+session.headers.update({
     "xi-api-key": API_KEY,
     "Content-Type": "application/json"
-}
+})
 data = {
     "text": "Hello, this is a test.",
     "model_id": "eleven_monolingual_v1",
@@ -24,7 +29,8 @@ data = {
 }
 
 print("\nAttempting to generate audio...")
-response = requests.post(url, headers=headers, json=data)
+response = session.post(url, json=data)
+session.close()
 
 if response.status_code == 200:
     print("\n[OK] TTS Generation SUCCESSFUL!")
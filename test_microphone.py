@@ -3,6 +3,7 @@ Microphone Test - Check audio input levels and devices
 """
 
 import sounddevice as sd
+import soundfile as sf
 import numpy as np
 import time
 
@@ -29,33 +30,49 @@ print("="*60 + "\n")
 duration = 5
 sample_rate = 16000
 
-audio_data = sd.rec(
-    int(duration * sample_rate),
+# The callback fills the recording and keeps a smoothed level for the
+# live meter, so the meter shows what the mic hears right now
+audio_data = np.zeros((duration * sample_rate, 1), dtype=np.float32)
+filled = [0]
+level = [0.0]
+
+def audio_callback(indata, frames, time_info, status):
+    n = min(frames, len(audio_data) - filled[0])
+    audio_data[filled[0]:filled[0] + n] = indata[:n]
+    filled[0] += n
+    level[0] = 0.9 * level[0] + 0.1 * float(np.abs(indata).mean())
+
+with sd.InputStream(
     samplerate=sample_rate,
     channels=1,
-    dtype=np.float32
-)
-
-# Show live volume meter
-for i in range(duration):
-    time.sleep(1)
-    # Get current audio level
-    current_chunk = audio_data[i*sample_rate:(i+1)*sample_rate]
-    if len(current_chunk) > 0:
-        volume = np.abs(current_chunk).mean()
+    dtype=np.float32,
+    blocksize=1024,
+    callback=audio_callback
+):
+    # Show live volume meter
+    for i in range(duration):
+        time.sleep(1)
+        volume = level[0]
         bars = int(volume * 100)
         print(f"Second {i+1}: {'|' * bars} ({volume:.4f})")
+    
+    # Let the last block land (give up after a second if the device stalls)
+    deadline = time.time() + 1
+    while filled[0] < len(audio_data) and time.time() < deadline:
+        time.sleep(0.01)
 
-sd.wait()
+# One |audio| pass, reused for all the stats below
+# (audio_data itself is still needed for the WAV)
+abs_buf = np.abs(audio_data)
 
 # Analyze the recording
 print("\n" + "="*60)
 print("Analysis:")
 print("="*60)
 
-volume_mean = np.abs(audio_data).mean()
-volume_max = np.abs(audio_data).max()
-volume_std = np.abs(audio_data).std()
+volume_mean = abs_buf.mean()
+volume_max = abs_buf.max()
+volume_std = abs_buf.std()
 
 print(f"Average volume: {volume_mean:.6f}")
 print(f"Max volume: {volume_max:.6f}")
@@ -79,16 +96,10 @@ else:
     print("\n[OK] Volume levels look good!")
     print("  - Whisper should be able to transcribe this")
 
-# Save the recording for manual inspection
-import wave
+# Save the recording for manual inspection (libsndfile scales, clips
+# and converts the float samples to 16-bit PCM)
 output_file = "test_recording.wav"
-with wave.open(output_file, 'wb') as wf:
-    wf.setnchannels(1)
-    wf.setsampwidth(2)
-    wf.setframerate(sample_rate)
-    # Convert float32 to int16
-    audio_int16 = (audio_data * 32767).astype(np.int16)
-    wf.writeframes(audio_int16.tobytes())
+sf.write(output_file, audio_data, sample_rate, subtype="PCM_16")
 
 print(f"\n[SAVED] Recording saved to: {output_file}")
 print("  - You can play this file to hear what was recorded")
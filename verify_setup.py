@@ -3,6 +3,7 @@ Quick Setup Test - Verify all components are working
 """
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent))
@@ -71,7 +72,7 @@ def test_whisper():
     except Exception as e:
         print(f"❌ Whisper error: {e}")
         print("\n💡 Install Whisper:")
-        print("   pip install openai-whisper")
+        print("   pip install faster-whisper")
         return False
 
 def test_tts():
@@ -134,13 +135,19 @@ def main():
     print("  SYCA V2 - SETUP VERIFICATION")
     print("🚀"*30)
     
-    results = {
-        "Config": test_config(),
-        "Ollama": test_ollama(),
-        "Whisper": test_whisper(),
-        "TTS": test_tts(),
-        "Hybrid Brain": test_hybrid_brain()
-    }
+    results = {"Config": test_config()}
+    
+    # The components don't depend on each other, so load them side by side
+    # (total time is the slowest one, not the sum; output may interleave)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {
+            "Ollama": executor.submit(test_ollama),
+            "Whisper": executor.submit(test_whisper),
+            "TTS": executor.submit(test_tts),
+            "Hybrid Brain": executor.submit(test_hybrid_brain)
+        }
+        for component, future in futures.items():
+            results[component] = future.result()
     
     # Summary
     print("\n" + "="*60)